@@ -1,8 +1,22 @@
 import streamlit as st
-from PIL import Image
-import torch
+import csv
+import io
 import time
-from model_utils import load_model, preprocess_image, predict_weather, WEATHER_CLASSES, text_to_speech, get_voice_announcement
+import os
+from concurrent.futures import ThreadPoolExecutor
+from model_utils import load_model, warm_up, preprocess_image, predict_weather, predict_weather_cached, predict_weather_batch, prediction_key, get_model_version, WEATHER_CLASSES, PREPROCESSOR
+from embedding_store import EmbeddingStore
+from ingestion import MAX_BATCH_IMAGES, MAX_IMAGE_BYTES, MAX_ZIP_BYTES, ImageRejected, expand_uploads, ingest
+from speech import AnnouncementAudioCache
+from prediction_cache import PredictionCache
+from prediction_history import HistoryWriter, class_counts_per_hour, confidence_histogram
+from cascade import CascadeModel, load_cascade
+import metrics
+from metrics import PREDICTIONS, STAGE_SECONDS
+import profiling
+from startup_timing import STARTUP
+from theme import stylesheet
+from translations import T
 
 # Version: 2.2 - Robust session state with complete defensive programming
 # ⚙️ CRITICAL: Initialize ALL session state variables at the very top
@@ -32,83 +46,86 @@ st.set_page_config(
 # 🌍 Language toggle
 language = st.selectbox("🌐 Language / اللغة", ["English", "العربية"])
 
-# 🎛️ Modern Settings Section
-st.markdown("### ⚙️ Settings")
-
-# Create better spaced columns for modern layout
-col_space1, col_dark, col_space2, col_voice, col_space3 = st.columns([0.5, 2, 0.3, 2, 0.5])
-
-# Ensure session state is accessible before using it - DEFENSIVE PROGRAMMING
-dark_mode_state = getattr(st.session_state, 'dark_mode', False) if hasattr(st.session_state, 'dark_mode') else False
-voice_enabled_state = getattr(st.session_state, 'voice_enabled', False) if hasattr(st.session_state, 'voice_enabled') else False
+def toggle_setting(key):
+    """Button callback: flips a session flag before the rerun, so no extra st.rerun() is needed."""
+    st.session_state[key] = not st.session_state.get(key, False)
 
-with col_dark:
-    # Dark mode toggle with enhanced styling
-    dark_icon = "🌙" if not dark_mode_state else "☀️"
-    dark_text = "Switch to Dark Mode" if not dark_mode_state else "Switch to Light Mode"
-    
-    # Create a more prominent button
-    if st.button(f"{dark_icon} Mode", key="dark_toggle", help=dark_text, use_container_width=True):
-        # Defensive session state update
-        if hasattr(st.session_state, 'dark_mode'):
-            st.session_state.dark_mode = not dark_mode_state
-        else:
-            st.session_state.dark_mode = True
-        st.rerun()
-    
-    # Modern status indicator
-    status_color = "#1976D2" if not dark_mode_state else "#90CAF9"
-    status_bg = "#E3F2FD" if not dark_mode_state else "#1E1E1E"
-    status_text = "☀️ Light Mode" if not dark_mode_state else "🌙 Dark Mode"
+# 🎛️ Modern Settings Section
+# A fragment: clicking a toggle re-renders only this panel, not the uploader, image preview or sidebar
+@st.fragment
+def settings_panel():
+    st.markdown("### ⚙️ Settings")
+
+    # Create better spaced columns for modern layout
+    col_space1, col_dark, col_space2, col_voice, col_space3 = st.columns([0.5, 2, 0.3, 2, 0.5])
+
+    # Ensure session state is accessible before using it - DEFENSIVE PROGRAMMING
+    dark_mode_state = st.session_state.get('dark_mode', False)
+    voice_enabled_state = st.session_state.get('voice_enabled', False)
+
+    with col_dark:
+        # Dark mode toggle with enhanced styling
+        dark_icon = "🌙" if not dark_mode_state else "☀️"
+        dark_text = "Switch to Dark Mode" if not dark_mode_state else "Switch to Light Mode"
+
+        # Create a more prominent button
+        st.button(f"{dark_icon} Mode", key="dark_toggle", help=dark_text, use_container_width=True,
+                  on_click=toggle_setting, args=("dark_mode",))
     
-    st.markdown(f"""
-    <div style="
-        background: {status_bg}; 
-        color: {status_color}; 
-        padding: 8px 16px; 
-        border-radius: 20px; 
-        text-align: center; 
-        font-weight: 600;
-        border: 1px solid {status_color}30;
-        margin-top: 8px;
-    ">
-        {status_text}
-    </div>
-    """, unsafe_allow_html=True)
-
-with col_voice:
-    # Voice toggle with enhanced styling
-    voice_icon = "🔊" if voice_enabled_state else "🔇"
-    voice_text = "Enable Voice Announcements" if not voice_enabled_state else "Disable Voice Announcements"
+        # Modern status indicator
+        status_color = "#1976D2" if not dark_mode_state else "#90CAF9"
+        status_bg = "#E3F2FD" if not dark_mode_state else "#1E1E1E"
+        status_text = "☀️ Light Mode" if not dark_mode_state else "🌙 Dark Mode"
     
-    # Create a more prominent button
-    if st.button(f"{voice_icon} Voice", key="voice_toggle", help=voice_text, use_container_width=True):
-        # Defensive session state update
-        if hasattr(st.session_state, 'voice_enabled'):
-            st.session_state.voice_enabled = not voice_enabled_state
-        else:
-            st.session_state.voice_enabled = True
-        st.rerun()
+        st.markdown(f"""
+        <div style="
+            background: {status_bg}; 
+            color: {status_color}; 
+            padding: 8px 16px; 
+            border-radius: 20px; 
+            text-align: center; 
+            font-weight: 600;
+            border: 1px solid {status_color}30;
+            margin-top: 8px;
+        ">
+            {status_text}
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col_voice:
+        # Voice toggle with enhanced styling
+        voice_icon = "🔊" if voice_enabled_state else "🔇"
+        voice_text = "Enable Voice Announcements" if not voice_enabled_state else "Disable Voice Announcements"
+
+        # Create a more prominent button
+        st.button(f"{voice_icon} Voice", key="voice_toggle", help=voice_text, use_container_width=True,
+                  on_click=toggle_setting, args=("voice_enabled",))
     
-    # Modern status indicator
-    status_color = "#4CAF50" if voice_enabled_state else "#757575"
-    status_bg = "#E8F5E8" if voice_enabled_state else "#F5F5F5"
-    status_text = "🔊 Voice ON" if voice_enabled_state else "🔇 Voice OFF"
+        # Modern status indicator
+        status_color = "#4CAF50" if voice_enabled_state else "#757575"
+        status_bg = "#E8F5E8" if voice_enabled_state else "#F5F5F5"
+        status_text = "🔊 Voice ON" if voice_enabled_state else "🔇 Voice OFF"
     
-    st.markdown(f"""
-    <div style="
-        background: {status_bg}; 
-        color: {status_color}; 
-        padding: 8px 16px; 
-        border-radius: 20px; 
-        text-align: center; 
-        font-weight: 600;
-        border: 1px solid {status_color}30;
-        margin-top: 8px;
-    ">
-        {status_text}
-    </div>
-    """, unsafe_allow_html=True)
+        st.markdown(f"""
+        <div style="
+            background: {status_bg}; 
+            color: {status_color}; 
+            padding: 8px 16px; 
+            border-radius: 20px; 
+            text-align: center; 
+            font-weight: 600;
+            border: 1px solid {status_color}30;
+            margin-top: 8px;
+        ">
+            {status_text}
+        </div>
+        """, unsafe_allow_html=True)
+
+    # 💅 Precomputed stylesheet for the current mode; injected here so a dark mode toggle
+    # restyles the page from this fragment's rerun
+    st.markdown(stylesheet(dark_mode_state), unsafe_allow_html=True)
+
+settings_panel()
 
 # Add a stylish separator
 st.markdown("""
@@ -120,381 +137,93 @@ st.markdown("""
 "></div>
 """, unsafe_allow_html=True)
 
-# Set variables based on session state - DEFENSIVE ACCESS
-dark_mode = getattr(st.session_state, 'dark_mode', False) if hasattr(st.session_state, 'dark_mode') else False
-voice_enabled = getattr(st.session_state, 'voice_enabled', False) if hasattr(st.session_state, 'voice_enabled') else False
-
-# 🗣️ Translation dictionary
-T = {
-    "English": {
-        "title": "⛅ Weather Classifier",
-        "subtitle": "Upload or capture a sky image to predict the weather condition.",
-        "method_label": "Input method:",
-        "upload": "📁 Upload",
-        "camera": "📷 Camera",
-        "upload_prompt": "Upload your sky image:",
-        "camera_prompt": "Take a picture:",
-        "predict_button": "🔮 Predict Weather",
-        "analyzing": "Analyzing the sky...",
-        "prediction": "🌤️ Prediction",
-        "confidence": "Confidence Levels:",
-        "voice_announcement": "🔊 Voice announcement enabled",
-        "voice_playing": "🎵 Playing voice announcement...",
-        "tips": {
-            'Cloudy': "☁️ Overcast skies. Possible light rain.",
-            'Rain': "🌧️ Rain expected. Grab an umbrella!",
-            'Shine': "☀️ Clear skies. Great for outdoor activities!",
-            'Sunrise': "🌅 Beautiful sunrise or sunset conditions.",
-        },
-        "about_title": "🛠️ About This App",
-        "about_desc": """
-This app uses a deep learning model to classify sky images into 4 weather types:
-
-- ☁️ Cloudy  
-- 🌧️ Rain  
-- ☀️ Shine  
-- 🌅 Sunrise  
-
-**How to use:**
-1. Upload or take a photo of the sky  
-2. Click **Predict Weather**  
-3. View results with confidence levels
-
-*Model: EfficientNet-B7 (97.78% accuracy)*
-""",
-        "details_title": "📊 Model Details",
-        "details": """
-- Input size: 224x224  
-- Framework: PyTorch  
-- Fine-tuned on weather dataset  
-"""
-    },
-    "العربية": {
-        "title": "⛅ مصنف الطقس",
-        "subtitle": "قم بتحميل أو التقاط صورة للسماء للتنبؤ بحالة الطقس.",
-        "method_label": "طريقة الإدخال:",
-        "upload": "📁 تحميل",
-        "camera": "📷 كاميرا",
-        "upload_prompt": "قم بتحميل صورة السماء:",
-        "camera_prompt": "التقط صورة:",
-        "predict_button": "🔮 تنبؤ بالطقس",
-        "analyzing": "جارٍ تحليل السماء...",
-        "prediction": "🌤️ التنبؤ",
-        "confidence": "مستويات الثقة:",
-        "voice_announcement": "🔊 الإعلان الصوتي مفعل",
-        "voice_playing": "🎵 جارٍ تشغيل الإعلان الصوتي...",
-        "tips": {
-            'Cloudy': "☁️ سماء ملبدة بالغيوم. احتمال هطول أمطار خفيفة.",
-            'Rain': "🌧️ من المتوقع هطول أمطار. لا تنس المظلة!",
-            'Shine': "☀️ سماء صافية. طقس مناسب للنشاطات الخارجية!",
-            'Sunrise': "🌅 شروق أو غروب جميل.",
-        },
-        "about_title": "🛠️ حول هذا التطبيق",
-        "about_desc": """
-يستخدم هذا التطبيق نموذج تعلم عميق لتصنيف صور السماء إلى 4 أنواع من الطقس:
-
-- ☁️ غائم  
-- 🌧️ ممطر  
-- ☀️ مشمس  
-- 🌅 شروق / غروب  
-
-**طريقة الاستخدام:**
-1. قم بتحميل أو التقاط صورة للسماء  
-2. اضغط على **تنبؤ بالطقس**  
-3. عرض النتائج مع مستويات الثقة
-
-*النموذج: EfficientNet-B7 (دقة 97.78%)*
-""",
-        "details_title": "📊 تفاصيل النموذج",
-        "details": """
-- حجم الإدخال: 224x224  
-- الإطار: PyTorch  
-- مدرب على مجموعة بيانات الطقس  
-"""
-    }
-}
-
-#  Enhanced Colors based on session state
-bg_color = "#121212" if dark_mode else "#ffffff"
-text_color = "#e0e0e0" if dark_mode else "#000000"
-header_color = "#90CAF9" if dark_mode else "#0D47A1"
-subheader_color = "#B0BEC5" if dark_mode else "#555"
-result_box_color = "#1E1E1E" if dark_mode else "#E3F2FD"
-card_bg = "#2D2D2D" if dark_mode else "#F8F9FA"
-border_color = "#404040" if dark_mode else "#E0E0E0"
-
-# 💅 Enhanced Custom CSS with Modern Design Standards
-st.markdown("""
-<style>
-/* Root variables for consistent theming */
-:root {{
-    --primary-color: #667eea;
-    --secondary-color: #764ba2;
-    --success-color: #4CAF50;
-    --warning-color: #FF9800;
-    --error-color: #f44336;
-    --text-primary: {text};
-    --bg-primary: {bg};
-    --bg-secondary: {card_bg};
-    --border-color: {border};
-}}
-
-/* Main app styling with smooth transitions */
-.stApp {{
-    background: linear-gradient(135deg, {bg} 0%, {card_bg} 100%);
-    color: {text};
-    transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
-}}
-
-/* Modern button styling */
-.stButton > button {{
-    background: linear-gradient(135deg, var(--primary-color), var(--secondary-color));
-    color: white !important;
-    border: none !important;
-    border-radius: 25px !important;
-    font-size: 16px !important;
-    font-weight: 600 !important;
-    padding: 12px 24px !important;
-    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
-    box-shadow: 0 4px 20px rgba(102, 126, 234, 0.3) !important;
-    position: relative !important;
-    overflow: hidden !important;
-}}
-
-.stButton > button:hover {{
-    transform: translateY(-3px) !important;
-    box-shadow: 0 8px 30px rgba(102, 126, 234, 0.4) !important;
-    background: linear-gradient(135deg, #7c4dff, #536dfe) !important;
-}}
-
-.stButton > button:active {{
-    transform: translateY(-1px) !important;
-    transition: all 0.1s !important;
-}}
-
-.stButton > button:focus {{
-    box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.3) !important;
-    outline: none !important;
-}}
-
-/* Header with gradient text */
-.header {{
-    font-size: 48px !important;
-    font-weight: 800 !important;
-    margin-bottom: 20px !important;
-    text-align: center !important;
-    background: linear-gradient(135deg, {header}, #42A5F5, #7c4dff) !important;
-    -webkit-background-clip: text !important;
-    -webkit-text-fill-color: transparent !important;
-    background-clip: text !important;
-    animation: float 3s ease-in-out infinite !important;
-}}
-
-@keyframes float {{
-    0%, 100% {{ transform: translateY(0px); }}
-    50% {{ transform: translateY(-10px); }}
-}}
-
-.subheader {{
-    font-size: 20px !important;
-    color: {subheader} !important;
-    margin-bottom: 35px !important;
-    text-align: center !important;
-    font-weight: 400 !important;
-    opacity: 0.9 !important;
-}}
-
-/* Enhanced result box with glassmorphism */
-.result-box {{
-    background: rgba(255, 255, 255, 0.1) !important;
-    backdrop-filter: blur(20px) !important;
-    border: 1px solid rgba(255, 255, 255, 0.2) !important;
-    border-radius: 20px !important;
-    padding: 30px !important;
-    margin-top: 30px !important;
-    box-shadow: 0 20px 60px rgba(0, 0, 0, 0.1) !important;
-    transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1) !important;
-}}
-
-.result-box:hover {{
-    transform: translateY(-5px) !important;
-    box-shadow: 0 30px 80px rgba(0, 0, 0, 0.15) !important;
-}}
-
-/* Modern confidence bars with animations */
-.confidence-bar {{
-    height: 24px !important;
-    border-radius: 12px !important;
-    margin-bottom: 16px !important;
-    text-align: center !important;
-    padding: 4px 16px !important;
-    font-weight: 600 !important;
-    font-size: 13px !important;
-    color: white !important;
-    background: linear-gradient(135deg, var(--primary-color), var(--secondary-color)) !important;
-    box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3) !important;
-    transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1) !important;
-    position: relative !important;
-    overflow: hidden !important;
-}}
-
-.confidence-bar::before {{
-    content: '';
-    position: absolute;
-    top: 0;
-    left: -100%;
-    width: 100%;
-    height: 100%;
-    background: linear-gradient(90deg, transparent, rgba(255,255,255,0.3), transparent);
-    transition: left 0.5s ease;
-}}
-
-.confidence-bar:hover {{
-    transform: scale(1.02) !important;
-    box-shadow: 0 6px 25px rgba(102, 126, 234, 0.4) !important;
-}}
-
-.confidence-bar:hover::before {{
-    left: 100%;
-}}
-
-/* Enhanced radio buttons */
-.stRadio > div {{
-    flex-direction: row !important;
-    justify-content: center !important;
-    gap: 15px !important;
-}}
-
-.stRadio > div > label {{
-    background: {card_bg} !important;
-    border: 2px solid {border} !important;
-    border-radius: 15px !important;
-    padding: 12px 20px !important;
-    margin: 0 !important;
-    cursor: pointer !important;
-    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
-    font-weight: 500 !important;
-}}
-
-.stRadio > div > label:hover {{
-    transform: translateY(-2px) !important;
-    box-shadow: 0 8px 25px rgba(0, 0, 0, 0.1) !important;
-    border-color: var(--primary-color) !important;
-}}
-
-/* Sidebar enhancements */
-.css-1d391kg {{
-    background: {card_bg} !important;
-    border-right: 2px solid {border} !important;
-    backdrop-filter: blur(10px) !important;
-}}
-
-/* Enhanced status messages */
-.stSuccess {{
-    background: linear-gradient(135deg, var(--success-color), #45A049) !important;
-    border: none !important;
-    border-radius: 12px !important;
-    color: white !important;
-    font-weight: 500 !important;
-    box-shadow: 0 4px 15px rgba(76, 175, 80, 0.3) !important;
-}}
-
-.stInfo {{
-    background: linear-gradient(135deg, var(--primary-color), #1976D2) !important;
-    border: none !important;
-    border-radius: 12px !important;
-    color: white !important;
-    font-weight: 500 !important;
-    box-shadow: 0 4px 15px rgba(33, 150, 243, 0.3) !important;
-}}
-
-.stError {{
-    background: linear-gradient(135deg, var(--error-color), #d32f2f) !important;
-    border: none !important;
-    border-radius: 12px !important;
-    color: white !important;
-    font-weight: 500 !important;
-    box-shadow: 0 4px 15px rgba(244, 67, 54, 0.3) !important;
-}}
-
-/* File uploader enhancements */
-.stFileUploader {{
-    border: 3px dashed {border} !important;
-    border-radius: 20px !important;
-    background: {card_bg} !important;
-    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
-    padding: 20px !important;
-}}
-
-.stFileUploader:hover {{
-    border-color: var(--primary-color) !important;
-    background: {card_bg} !important;
-    transform: scale(1.02) !important;
-}}
-
-/* Camera input styling */
-.stCameraInput {{
-    border-radius: 20px !important;
-    overflow: hidden !important;
-    box-shadow: 0 8px 30px rgba(0, 0, 0, 0.1) !important;
-    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
-}}
-
-.stCameraInput:hover {{
-    transform: scale(1.02) !important;
-    box-shadow: 0 12px 40px rgba(0, 0, 0, 0.15) !important;
-}}
-
-/* Selectbox enhancements */
-.stSelectbox > div > div {{
-    background: {card_bg} !important;
-    border: 2px solid {border} !important;
-    border-radius: 15px !important;
-    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
-}}
-
-.stSelectbox > div > div:hover {{
-    border-color: var(--primary-color) !important;
-    box-shadow: 0 4px 15px rgba(102, 126, 234, 0.2) !important;
-}}
-
-/* Loading spinner enhancement */
-.stSpinner {{
-    border-top-color: var(--primary-color) !important;
-}}
-
-/* Responsive design improvements */
-@media (max-width: 768px) {{
-    .header {{
-        font-size: 36px !important;
-    }}
-    
-    .subheader {{
-        font-size: 16px !important;
-    }}
-    
-    .result-box {{
-        padding: 20px !important;
-        margin-top: 20px !important;
-    }}
-}}
-</style>
-""".format(
-    bg=bg_color, 
-    text=text_color, 
-    header=header_color, 
-    subheader=subheader_color, 
-    box=result_box_color,
-    card_bg=card_bg,
-    border=border_color
-), unsafe_allow_html=True)
-
 # 🧠 Load model
+# Set WEATHER_SHARE_WEIGHTS=1 when running several app processes per host to share one copy of the weights,
+# and WEATHER_BF16=1 for bfloat16 autocast on CPUs with native support.
+# Serve a distilled student with e.g. WEATHER_MODEL_ARCH=mobilenet_v3_large WEATHER_MODEL_PATH=student_mobilenet_v3_large.pth
+# or put it in front of B7 as a cascade with WEATHER_CASCADE_FIRST_STAGE=<student weights> (+ _ARCH, _THRESHOLD)
+def load_weather_model():
+    model_path = os.environ.get("WEATHER_MODEL_PATH", "best_model.pth")
+    share_weights = os.environ.get("WEATHER_SHARE_WEIGHTS") == "1"
+    bf16 = os.environ.get("WEATHER_BF16") == "1"
+    if os.environ.get("WEATHER_CASCADE_FIRST_STAGE"):
+        model = load_cascade(
+            os.environ["WEATHER_CASCADE_FIRST_STAGE"],
+            os.environ.get("WEATHER_CASCADE_ARCH", "mobilenet_v3_large"),
+            model_path,
+            threshold=float(os.environ.get("WEATHER_CASCADE_THRESHOLD", "0.9")),
+            share_weights=share_weights,
+            bf16=bf16,
+        )
+    else:
+        model = load_model(
+            model_path,
+            arch=os.environ.get("WEATHER_MODEL_ARCH", "efficientnet_b7"),
+            share_weights=share_weights,
+            bf16=bf16,
+        )
+    # Dummy passes at the single-image and batch-grid sizes, so the first prediction is already fast
+    warm_up(model)
+    print(STARTUP.report())
+    return model
+
+# Loaded and warmed up on a background thread, once per process: the page renders meanwhile,
+# with the predict buttons disabled until the model is ready
+@st.cache_resource
+def start_model_loading():
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-loader").submit(load_weather_model)
+
+model_future = start_model_loading()
+if model_future.done() and model_future.exception() is not None:
+    # Retry on the next rerun instead of caching the failure
+    start_model_loading.clear()
+    raise model_future.exception()
+model = model_future.result() if model_future.done() else None
+
+# 🗃️ Prediction cache shared by every session (set WEATHER_PREDICTION_CACHE="" to keep it in memory only)
+@st.cache_resource
+def load_prediction_cache():
+    return PredictionCache(max_entries=512, disk_path=os.environ.get("WEATHER_PREDICTION_CACHE", "prediction_cache.sqlite") or None)
+
+prediction_cache = load_prediction_cache()
+
+# 🔍 Embeddings of past predictions for "similar skies" search (set WEATHER_EMBEDDINGS_DIR="" to disable)
+@st.cache_resource
+def load_embedding_store(model_version):
+    directory = os.environ.get("WEATHER_EMBEDDINGS_DIR", "embeddings")
+    return EmbeddingStore(directory, model_version) if directory else None
+
+embedding_store = load_embedding_store(get_model_version(model)) if model is not None else None
+
+# 📜 Every prediction is recorded by a background writer (set WEATHER_HISTORY_DIR="" to disable)
+HISTORY_DIR = os.environ.get("WEATHER_HISTORY_DIR", "history")
+
+@st.cache_resource
+def load_prediction_history():
+    return HistoryWriter(HISTORY_DIR) if HISTORY_DIR else None
+
+prediction_history = load_prediction_history()
+
+# 📈 Runtime metrics at http://<host>:$WEATHER_METRICS_PORT/metrics (Prometheus) and /metrics.json
+@st.cache_resource
+def start_metrics_exporter():
+    port = os.environ.get("WEATHER_METRICS_PORT")
+    return metrics.serve(int(port)) if port else None
+
+start_metrics_exporter()
+
+# 🔊 Announcement clips rendered once and played in the browser; announcements are in Arabic,
+# so once a visitor turns voice on, those clips are rendered in the background
 @st.cache_resource
-def load_cached_model():
-    return load_model('best_model.pth')
+def load_announcement_audio():
+    return AnnouncementAudioCache()
+
+announcement_audio = load_announcement_audio()
+if st.session_state.get('voice_enabled', False):
+    announcement_audio.warm(WEATHER_CLASSES, languages=['العربية'])
 
-model = load_cached_model()
+# ⏱️ Opt-in per-layer profiling (also enabled by WEATHER_PROFILE=1)
+profile_enabled = st.sidebar.toggle("⏱️ Profile forward pass", value=profiling.profiling_enabled())
 
 # 🌐 Localized labels
 L = T[language]
@@ -503,34 +232,69 @@ L = T[language]
 st.markdown(f'<div class="header">{L["title"]}</div>', unsafe_allow_html=True)
 st.markdown(f'<div class="subheader">{L["subtitle"]}</div>', unsafe_allow_html=True)
 
+# ⏳ Polls the loader while the model warms up, then reruns the page once to enable the predict buttons
+@st.fragment(run_every=1)
+def model_status():
+    if model_future.done():
+        st.rerun()
+    st.info(f"⏳ {L['model_warming_up']}")
+
+if model is None:
+    model_status()
+
 # 📤 Input method
 col1, col2 = st.columns(2)
 with col1:
     method = st.radio(L["method_label"], (L["upload"], L["camera"]), horizontal=True)
 
-image = None
+source = None
+batch_uploads = []
 if method == L["upload"]:
-    file = st.file_uploader(L["upload_prompt"], type=["jpg", "jpeg", "png"], label_visibility="collapsed")
-    if file:
-        image = Image.open(file)
+    uploads = st.file_uploader(L["upload_prompt"], type=["jpg", "jpeg", "png", "zip"], accept_multiple_files=True,
+                               label_visibility="collapsed")
+    st.caption(L["upload_limits"].format(image_mb=MAX_IMAGE_BYTES // 2**20, zip_mb=MAX_ZIP_BYTES // 2**20,
+                                         images=MAX_BATCH_IMAGES))
+    # One image keeps the single-prediction view; several images or a zip go to the batch grid
+    if len(uploads) == 1 and not uploads[0].name.lower().endswith(".zip"):
+        source = uploads[0]
+    else:
+        batch_uploads = uploads
 else:
-    cam = st.camera_input(L["camera_prompt"], label_visibility="collapsed")
-    if cam:
-        image = Image.open(cam)
+    source = st.camera_input(L["camera_prompt"], label_visibility="collapsed")
 
-# 🖼️ Predict
-if image is not None:
-    st.image(image, caption="📷", use_container_width=True)
+# 🛡️ Validated before decoding; only a model-sized image and a small preview are kept
+image = preview = None
+if source:
+    try:
+        ingested = ingest(source.getvalue(), PREPROCESSOR)
+        image, preview = ingested.image, ingested.preview
+    except ImageRejected as e:
+        st.error(f"❌ {L['image_rejected']}: {e}")
 
-    if st.button(L["predict_button"], use_container_width=True):
+# 🖼️ Predict
+# A fragment: predicting re-renders only the results, not the uploader, image preview or sidebar
+@st.fragment
+def results_panel(image, source_name):
+    if st.button(L["predict_button"], use_container_width=True, disabled=model is None):
         with st.spinner(L["analyzing"]):
             time.sleep(1)
-            img_tensor = preprocess_image(image)
-            pred, probs = predict_weather(model, img_tensor)
+            predict_start = time.perf_counter()
+            if profile_enabled:
+                # Profiling needs a real forward pass, so bypass the cache
+                pred, probs, stage = predict_weather(model, preprocess_image(image), profile=True, return_stage=True)
+            else:
+                pred, probs, stage = predict_weather_cached(model, image, prediction_cache, return_stage=True,
+                                                            embeddings=embedding_store, source=source_name)
             class_name = WEATHER_CLASSES[pred]
             max_confidence = probs[pred]
+            PREDICTIONS.inc(**{"class": class_name, "channel": "ui"})
+            if prediction_history is not None:
+                prediction_history.record(class_name, probs, channel="ui", source=source_name,
+                                          model_version=get_model_version(model), stage=stage,
+                                          latency_ms=(time.perf_counter() - predict_start) * 1000)
 
             placeholder = st.empty()
+            render_start = time.perf_counter()
             with placeholder.container():
                 st.markdown('<div class="result-box">', unsafe_allow_html=True)
                 st.markdown(f"## {L['prediction']}: **{class_name}**")
@@ -544,37 +308,140 @@ if image is not None:
                     )
                 st.markdown("</div>", unsafe_allow_html=True)
 
+                if isinstance(model, CascadeModel):
+                    stats = model.stats()
+                    st.caption(f"⚡ {L['answered_by']}: {L['stages'].get(stage, stage)} · "
+                               f"{L['escalation_rate']}: {stats['escalation_rate']:.0%}")
+
             st.success(L["tips"][class_name])
+            STAGE_SECONDS.observe(time.perf_counter() - render_start, stage="render")
+
+            # 🔍 Similar past skies, from stored embeddings (no second forward pass)
+            similar = embedding_store.search_key(prediction_key(model, image), k=5) if embedding_store else []
+            if similar and similar[0]["duplicate"]:
+                st.warning(f"♻️ {L['near_duplicate']}: {similar[0]['source']} ({similar[0]['similarity']:.1%})")
+            if similar:
+                with st.expander(f"🔍 {L['similar_skies']}"):
+                    for match in similar:
+                        st.markdown(f"**{match['class']}** · {match['source']} · "
+                                    f"{L['similarity']} {match['similarity']:.1%}")
             
             # Voice announcement in Arabic
-            if voice_enabled:
+            if st.session_state.get('voice_enabled', False):
                 # Show voice status
                 voice_status = st.empty()
                 voice_status.info(f"🔊 {L['voice_announcement']}")
                 
                 try:
-                    # Get voice announcement text in Arabic
-                    voice_text = get_voice_announcement(class_name, 'العربية', max_confidence)
-                    
-                    # Use Arabic language code for TTS
-                    lang_code = 'ar'
-                    
-                    # Update status to show playing
+                    # Pre-rendered Arabic announcement for this class and confidence bucket
                     voice_status.info(f"🎵 {L['voice_playing']}")
-                    
-                    # Play voice announcement in Arabic
-                    text_to_speech(voice_text, lang_code)
-                    
-                    # Brief delay to show the playing message
-                    time.sleep(1)
-                    
-                    # Update status to show completion
+                    clip_path = announcement_audio.get(class_name, 'العربية', max_confidence)
+                    if clip_path is None:
+                        raise RuntimeError("text-to-speech rendering failed")
+
+                    # Played by the visitor's browser, not the server's speakers
+                    st.audio(clip_path, format="audio/wav", autoplay=True)
                     voice_status.success("✅ Voice announcement completed!" if language == "English" else "✅ تم تشغيل الإعلان الصوتي!")
-                    
+
                 except Exception as e:
                     voice_status.error(f"❌ Voice error: {str(e)}" if language == "English" else f"❌ خطأ في الصوت: {str(e)}")
                     st.info("💡 Please check your system's text-to-speech settings" if language == "English" else "💡 يرجى التحقق من إعدادات النص إلى كلام")
 
+            # ⏱️ Per-layer breakdown of this prediction's forward pass
+            last_profile = profiling.get_last_profile()
+            if profile_enabled and last_profile is not None:
+                with st.expander("⏱️ Forward Pass Profile"):
+                    st.code(last_profile["module_table"], language=None)
+                    st.markdown("**Top operators**")
+                    st.code(last_profile["op_table"], language=None)
+                    st.caption(f"Chrome trace: `{last_profile['trace_path']}`  \nFlamegraph stacks: `{last_profile['stacks_path']}`")
+
+# 🗂️ Batch prediction: images go through the model BATCH_SIZE at a time and the grid fills in per batch
+BATCH_SIZE = 16
+GRID_COLUMNS = 4
+THUMBNAIL_SIZE = 160
+
+def result_row(name, probs=None, error=None, decode_ms=None, forward_ms=None):
+    """One CSV row, with the same columns as classify_images.py."""
+    row = {"source": name, "class": WEATHER_CLASSES[int(probs.argmax())] if probs is not None else None}
+    row.update({f"prob_{c}": round(float(probs[i]), 4) if probs is not None else None for i, c in enumerate(WEATHER_CLASSES)})
+    row["decode_ms"] = round(decode_ms, 2) if decode_ms is not None else None
+    row["forward_ms"] = round(forward_ms, 2) if forward_ms is not None else None
+    row["error"] = error
+    return row
+
+@st.fragment
+def batch_panel(uploads):
+    try:
+        items = expand_uploads(uploads)
+    except ImageRejected as e:
+        st.error(f"❌ {L['image_rejected']}: {e}")
+        return
+    if not items:
+        st.error(f"❌ {L['no_images']}")
+        return
+    st.caption(L["batch_count"].format(n=len(items)))
+    if not st.button(L["predict_all_button"], use_container_width=True, disabled=model is None):
+        return
+
+    progress = st.progress(0.0, text=L["analyzing"])
+    rows = []
+    for start in range(0, len(items), BATCH_SIZE):
+        tiles = []  # (row, thumbnail or None) in upload order
+        accepted = []
+        for name, read in items[start:start + BATCH_SIZE]:
+            decode_start = time.perf_counter()
+            try:
+                ingested = ingest(read(), PREPROCESSOR, preview_size=THUMBNAIL_SIZE)
+            except ImageRejected as e:
+                tiles.append((result_row(name, error=str(e)), None))
+                continue
+            accepted.append((len(tiles), ingested, (time.perf_counter() - decode_start) * 1000))
+            tiles.append((None, ingested.preview))
+
+        if accepted:
+            forward_start = time.perf_counter()
+            _, batch_probs = predict_weather_batch(model, [ingested.image for _, ingested, _ in accepted],
+                                                   batch_size=BATCH_SIZE, cache=prediction_cache,
+                                                   embeddings=embedding_store,
+                                                   sources=[items[start + index][0] for index, _, _ in accepted])
+            # Like classify_images.py: each image's share of the batch (cache hits included)
+            forward_ms = (time.perf_counter() - forward_start) * 1000 / len(accepted)
+            for (index, _, decode_ms), probs in zip(accepted, batch_probs):
+                name = items[start + index][0]
+                tiles[index] = (result_row(name, probs, decode_ms=decode_ms, forward_ms=forward_ms), tiles[index][1])
+                PREDICTIONS.inc(**{"class": WEATHER_CLASSES[int(probs.argmax())], "channel": "ui"})
+                if prediction_history is not None:
+                    prediction_history.record(WEATHER_CLASSES[int(probs.argmax())], probs, channel="ui", source=name,
+                                              model_version=get_model_version(model))
+
+        render_start = time.perf_counter()
+        for i in range(0, len(tiles), GRID_COLUMNS):
+            for column, (row, thumbnail) in zip(st.columns(GRID_COLUMNS), tiles[i:i + GRID_COLUMNS]):
+                with column:
+                    if thumbnail is not None:
+                        st.image(thumbnail, use_container_width=True)
+                        st.markdown(f"**{row['class']}** · {row['prob_' + row['class']]:.1f}%")
+                    else:
+                        st.error("❌")
+                    st.caption(row["source"] if row["error"] is None else f"{row['source']}: {row['error']}")
+        STAGE_SECONDS.observe((time.perf_counter() - render_start) / len(tiles), stage="render")
+        rows.extend(row for row, _ in tiles)
+        progress.progress(len(rows) / len(items), text=f"{len(rows)}/{len(items)}")
+
+    csv_file = io.StringIO()
+    writer = csv.DictWriter(csv_file, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+    st.download_button(L["download_csv"], csv_file.getvalue(), file_name="weather_predictions.csv",
+                       mime="text/csv", on_click="ignore", use_container_width=True)
+
+if image is not None:
+    st.image(preview, caption="📷", use_container_width=True)
+    results_panel(image, source.name if method == L["upload"] else "camera")
+elif batch_uploads:
+    batch_panel(batch_uploads)
+
 # 📌 Sidebar
 with st.sidebar:
     st.markdown(f"## {L['about_title']}")
@@ -582,3 +449,29 @@ with st.sidebar:
     st.markdown("---")
     st.markdown(f"### {L['details_title']}")
     st.markdown(L["details"])
+
+# 📜 History panel: aggregates over the compacted history files, which the writer refreshes every minute
+@st.cache_data(ttl=30)
+def history_summary(directory):
+    counts = class_counts_per_hour(directory).to_pandas()
+    if counts.empty:
+        return 0, None, None
+    per_hour = counts.pivot(index="hour", columns="class", values="count").fillna(0)
+    histogram, edges = confidence_histogram(directory)
+    labels = [f"{low:.0f}-{high:.0f}%" for low, high in zip(edges[:-1], edges[1:])]
+    return int(counts["count"].sum()), per_hour, {"confidence": dict(zip(labels, histogram.tolist()))}
+
+if HISTORY_DIR:
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown(f"### {L['history_title']}")
+        total, per_hour, histogram = history_summary(HISTORY_DIR)
+        if total:
+            st.metric(L["history_total"], total)
+            st.caption(L["history_per_hour"])
+            st.bar_chart(per_hour)
+            st.caption(L["history_confidence"])
+            st.bar_chart(histogram)
+        else:
+            st.caption(L["history_empty"])
+
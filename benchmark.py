@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""Reproducible offline benchmark of the inference path.
+
+Measures preprocessing, forward-pass and end-to-end latency (p50/p95/p99)
+and throughput across batch sizes, thread counts and precision modes. Runs
+without network access: if the weights file is missing, the `load_model`
+architecture is used with seeded random weights. Inputs are synthetic
+JPEGs at several resolutions.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --output bench.json --baseline baseline.json --tolerance 0.10
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from model_utils import ARCHITECTURES, PREPROCESSOR, bf16_supported, build_model, load_model, prepare_for_inference
+import quantization
+
+RESOLUTIONS = ((640, 480), (1920, 1080), (4032, 3024))
+INFERENCE_OPTIONS = ('fold_bn', 'channels_last', 'bf16')
+# Cumulative, so each step shows what one more option adds
+DEFAULT_VARIANTS = ['none', 'fold_bn', 'fold_bn,channels_last', 'fold_bn,channels_last,bf16']
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+        'mean_ms': float(samples.mean()),
+    }
+
+
+def timed(fn, runs, warmup):
+    """Run `fn` warmup + runs times and return the timed samples in milliseconds."""
+    samples = []
+    for i in range(warmup + runs):
+        start = time.perf_counter()
+        fn()
+        if i >= warmup:
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def synthetic_jpeg(width, height, seed):
+    """A sky-like gradient with noise, JPEG-encoded (deterministic for a given seed)."""
+    rng = np.random.RandomState(seed)
+    y = np.linspace(0, 1, height)[:, None, None]
+    sky = np.array([90, 150, 230]) * (1 - y) + np.array([230, 230, 240]) * y
+    pixels = np.broadcast_to(sky, (height, width, 3)) + rng.normal(0, 12, (height, width, 3))
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def parse_variant(variant):
+    """'fold_bn,channels_last' -> ('fold_bn', 'channels_last'); 'none' -> ()."""
+    options = tuple(option for option in variant.split(',') if option and option != 'none')
+    unknown = set(options) - set(INFERENCE_OPTIONS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown inference option(s) {sorted(unknown)}, expected {INFERENCE_OPTIONS}")
+    return options
+
+
+def benchmark_model(weights, precision, calibration_images, arch='efficientnet_b7', options=()):
+    """The model for a precision mode and fp32 inference options; random weights when `weights` doesn't exist."""
+    flags = {option: option in options for option in INFERENCE_OPTIONS}
+    if os.path.exists(weights):
+        model = load_model(weights, arch=arch, **(flags if precision == 'fp32' else {}))
+    else:
+        torch.manual_seed(0)
+        model = build_model(arch=arch).eval()
+        if precision == 'fp32':
+            prepare_for_inference(model, **flags)
+    if precision == 'fp32':
+        return model
+    calibration = [PREPROCESSOR.batch(Image.open(io.BytesIO(data)) for data in calibration_images)]
+    return quantization.quantize_model(model, precision, calibration)
+
+
+def run(args):
+    images = {f"{w}x{h}": synthetic_jpeg(w, h, seed=i) for i, (w, h) in enumerate(RESOLUTIONS)}
+    sample = images[f"{RESOLUTIONS[0][0]}x{RESOLUTIONS[0][1]}"]
+    results = {
+        'meta': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'arch': args.arch,
+            'weights': args.weights if os.path.exists(args.weights) else 'random (seed 0)',
+            'runs': args.runs,
+            'bf16_supported': bf16_supported(),
+        },
+        'metrics': {},
+    }
+    metrics = results['metrics']
+
+    # Decode + preprocess, per input resolution
+    for name, data in images.items():
+        samples = timed(lambda: PREPROCESSOR(Image.open(io.BytesIO(data))), args.runs, args.warmup)
+        metrics[f"preprocess/{name}"] = percentiles(samples)
+        print(f"🖼️ preprocess {name}: p50 {metrics[f'preprocess/{name}']['p50_ms']:.1f} ms")
+
+    # Inference options only apply to fp32; the name of a mode is its precision plus its options
+    modes = [(precision, options) for precision in args.precisions
+             for options in (args.variants if precision == 'fp32' else [()])]
+    for precision, options in dict.fromkeys(modes):
+        if 'bf16' in options and not bf16_supported():
+            print(f"⏭️ Skipping {'+'.join(options)}: this CPU has no native bfloat16 support")
+            continue
+        mode = '+'.join((precision, *options))
+        model = benchmark_model(args.weights, precision, list(images.values()), args.arch, options)
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            with torch.inference_mode():
+                for batch_size in args.batch_sizes:
+                    batch = torch.randn(batch_size, 3, 224, 224, generator=torch.Generator().manual_seed(0))
+                    samples = timed(lambda: model(batch), args.runs, args.warmup)
+                    key = f"forward/{mode}/threads={threads}/batch={batch_size}"
+                    metrics[key] = percentiles(samples)
+                    metrics[key]['images_per_second'] = batch_size * 1000 / metrics[key]['mean_ms']
+                    print(f"🧠 {key}: p50 {metrics[key]['p50_ms']:.1f} ms, "
+                          f"{metrics[key]['images_per_second']:.1f} img/s")
+
+                def end_to_end():
+                    model(PREPROCESSOR(Image.open(io.BytesIO(sample))).unsqueeze(0)).argmax(dim=1)
+
+                key = f"end_to_end/{mode}/threads={threads}"
+                metrics[key] = percentiles(timed(end_to_end, args.runs, args.warmup))
+                print(f"⏱️ {key}: p50 {metrics[key]['p50_ms']:.1f} ms, p99 {metrics[key]['p99_ms']:.1f} ms")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of `results` against `baseline`: slower p50/p95 or lower throughput."""
+    regressions = []
+    for key, current in results['metrics'].items():
+        previous = baseline.get('metrics', {}).get(key)
+        if previous is None:
+            continue
+        for stat in ('p50_ms', 'p95_ms'):
+            if current[stat] > previous[stat] * (1 + tolerance):
+                regressions.append(f"{key} {stat}: {previous[stat]:.2f} -> {current[stat]:.2f}")
+        if 'images_per_second' in current:
+            if current['images_per_second'] < previous['images_per_second'] * (1 - tolerance):
+                regressions.append(f"{key} images_per_second: {previous['images_per_second']:.1f} "
+                                   f"-> {current['images_per_second']:.1f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weights', default='best_model.pth', help="random weights are used if missing")
+    parser.add_argument('--arch', default='efficientnet_b7', choices=ARCHITECTURES)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="previous results JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10, help="allowed relative slowdown")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 16, 32])
+    parser.add_argument('--threads', type=int, nargs='+', default=[torch.get_num_threads()])
+    parser.add_argument('--precisions', nargs='+', default=['fp32'], choices=quantization.PRECISIONS)
+    parser.add_argument('--variants', type=parse_variant, nargs='+', default=[parse_variant(v) for v in DEFAULT_VARIANTS],
+                        help="fp32 inference options to compare, comma-separated per variant "
+                             f"({', '.join(INFERENCE_OPTIONS)}, or none)")
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"✅ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import threading
+
+import torch
+
+from model_utils import load_model
+
+FIRST_STAGE = 'first_stage'
+SECOND_STAGE = 'second_stage'
+
+
+class CascadeModel:
+    """Confidence-gated two-stage classifier: a cheap model first, the full B7 on demand.
+
+    Every image goes through `first_stage`. Images whose top softmax
+    probability reaches `threshold` (0-1) are answered there; only the rest
+    are sent to `second_stage`. It is called like a model (returning logits),
+    and `predict` also says which stage answered each image.
+    """
+
+    def __init__(self, first_stage, second_stage, threshold=0.9):
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError("❌ Cascade threshold must be between 0 and 1")
+        self.first_stage = first_stage
+        self.second_stage = second_stage
+        self.threshold = threshold
+        self.model_version = (
+            f"cascade({getattr(first_stage, 'model_version', '?')}"
+            f">{getattr(second_stage, 'model_version', '?')}@{threshold})"
+        )
+        self.requests = 0
+        self.escalations = 0
+        self._lock = threading.Lock()
+
+    def predict(self, images):
+        """Return (logits, stages): stages[i] is FIRST_STAGE or SECOND_STAGE for image i."""
+        with torch.inference_mode():
+            logits = self.first_stage(images)
+            confidence = torch.softmax(logits, dim=1).max(dim=1).values
+            escalate = confidence < self.threshold
+            if escalate.any():
+                logits = logits.clone()
+                logits[escalate] = self.second_stage(images[escalate]).to(logits.dtype)
+
+        with self._lock:
+            self.requests += images.shape[0]
+            self.escalations += int(escalate.sum())
+        stages = [SECOND_STAGE if e else FIRST_STAGE for e in escalate.tolist()]
+        return logits, stages
+
+    def __call__(self, images):
+        return self.predict(images)[0]
+
+    def eval(self):
+        return self
+
+    @property
+    def escalation_rate(self):
+        return self.escalations / self.requests if self.requests else 0.0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'requests': self.requests,
+                'escalations': self.escalations,
+                'escalation_rate': self.escalations / self.requests if self.requests else 0.0,
+            }
+
+
+def load_cascade(first_stage_path, first_stage_arch, model_path='best_model.pth', threshold=0.9, **kwargs):
+    """Build a cascade from a distilled student (see distill.py) and the full B7.
+
+    Extra keyword arguments (precision, share_weights, ...) apply to the B7.
+    """
+    first_stage = load_model(first_stage_path, arch=first_stage_arch)
+    second_stage = load_model(model_path, **kwargs)
+    return CascadeModel(first_stage, second_stage, threshold=threshold)
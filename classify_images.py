@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""Headless bulk weather classification of image directories, globs and tar/zip archives.
+
+    python -m classify_images /data/frames --output results.jsonl
+    python -m classify_images "/data/**/*.jpg" --output results.csv --workers 8
+    python -m classify_images frames.tar --output results.parquet --batch-size 32
+
+Runs are resumable: sources already present in the output are skipped.
+"""
+
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+
+from model_utils import ARCHITECTURES, IMAGE_EXTENSIONS, PREPROCESSOR, WEATHER_CLASSES, get_model_version, load_model
+from prediction_history import HISTORY_DIR, HistoryWriter
+
+OUTPUT_FORMATS = ('jsonl', 'csv', 'parquet')
+
+
+def list_sources(source):
+    """Expand a directory, glob or archive into (kind, container, member) items."""
+    if os.path.isfile(source) and zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = sorted(n for n in archive.namelist() if n.lower().endswith(IMAGE_EXTENSIONS))
+        return [('zip', source, name) for name in names]
+    if os.path.isfile(source) and tarfile.is_tarfile(source):
+        with tarfile.open(source) as archive:
+            members = [m for m in archive.getmembers() if m.isfile() and m.name.lower().endswith(IMAGE_EXTENSIONS)]
+        return [('tar', source, member) for member in sorted(members, key=lambda m: m.name)]
+    if os.path.isdir(source):
+        paths = glob.glob(os.path.join(source, '**', '*'), recursive=True)
+    else:
+        paths = glob.glob(source, recursive=True)
+    return [('file', None, path) for path in sorted(paths) if path.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def source_id(item):
+    """Stable identifier of an item, written to the output and used for resuming."""
+    kind, container, member = item
+    if kind == 'file':
+        return member
+    name = member.name if kind == 'tar' else member
+    return f"{container}::{name}"
+
+
+class ImageSourceDataset(Dataset):
+    """Decodes and preprocesses images in DataLoader workers; archives are opened once per worker."""
+
+    def __init__(self, items):
+        self.items = items
+        self._archives = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def _read(self, item):
+        kind, container, member = item
+        if kind == 'file':
+            with open(member, 'rb') as f:
+                return f.read()
+        if container not in self._archives:
+            self._archives[container] = zipfile.ZipFile(container) if kind == 'zip' else tarfile.open(container)
+        archive = self._archives[container]
+        if kind == 'zip':
+            return archive.read(member)
+        return archive.extractfile(member).read()
+
+    def __getitem__(self, index):
+        item = self.items[index]
+        start = time.perf_counter()
+        try:
+            tensor = PREPROCESSOR(Image.open(io.BytesIO(self._read(item))))
+            error = None
+        except Exception as e:
+            tensor, error = None, f"{type(e).__name__}: {e}"
+        return source_id(item), tensor, (time.perf_counter() - start) * 1000, error
+
+
+def collate(samples):
+    """Stack the decodable images; keep failures aside so they can be recorded."""
+    good = [s for s in samples if s[1] is not None]
+    failed = [(s[0], s[3]) for s in samples if s[1] is None]
+    images = torch.stack([s[1] for s in good]) if good else None
+    return images, [s[0] for s in good], [s[2] for s in good], failed
+
+
+class ResultWriter:
+    """Appends result rows to JSONL, CSV or a directory of Parquet parts."""
+
+    def __init__(self, path, output_format):
+        self.path = path
+        self.format = output_format
+        self.columns = ['source', 'class', *[f"prob_{c}" for c in WEATHER_CLASSES],
+                        'decode_ms', 'forward_ms', 'error']
+        self._parts = 0
+        if self.format == 'parquet':
+            os.makedirs(path, exist_ok=True)
+            self._parts = len(glob.glob(os.path.join(path, 'part-*.parquet')))
+
+    def done_sources(self):
+        """Sources already written by a previous run."""
+        if not os.path.exists(self.path):
+            return set()
+        if self.format == 'jsonl':
+            done = set()
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        done.add(json.loads(line)['source'])
+                    except (ValueError, KeyError):
+                        continue  # a line cut short by an interrupted run
+            return done
+        if self.format == 'csv':
+            with open(self.path, newline='') as f:
+                return {row['source'] for row in csv.DictReader(f)}
+        import pyarrow.parquet as pq
+        parts = sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+        return {s for part in parts for s in pq.read_table(part, columns=['source']).column('source').to_pylist()}
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.format == 'jsonl':
+            with open(self.path, 'a') as f:
+                f.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        elif self.format == 'csv':
+            new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            with open(self.path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.columns)
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(rows)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pylist(rows, schema=self._parquet_schema(pa))
+            pq.write_table(table, os.path.join(self.path, f"part-{self._parts:05d}.parquet"))
+            self._parts += 1
+
+    def _parquet_schema(self, pa):
+        fields = [pa.field('source', pa.string()), pa.field('class', pa.string())]
+        fields += [pa.field(f"prob_{c}", pa.float32()) for c in WEATHER_CLASSES]
+        fields += [pa.field('decode_ms', pa.float32()), pa.field('forward_ms', pa.float32()),
+                   pa.field('error', pa.string())]
+        return pa.schema(fields)
+
+
+def output_format(path, requested=None):
+    if requested:
+        return requested
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension in ('jsonl', 'json', 'ndjson'):
+        return 'jsonl'
+    if extension in OUTPUT_FORMATS:
+        return extension
+    raise ValueError(f"❌ Can't infer the output format of '{path}', pass --format")
+
+
+def classify(model, loader, writer, total, flush_every=4, history=None):
+    """Run batched inference over `loader`, writing rows and printing throughput.
+
+    Predictions are also recorded to `history` (a HistoryWriter), if given.
+    """
+    model_version = get_model_version(model) if history is not None else None
+    start = time.perf_counter()
+    processed = 0
+    pending = []
+    with torch.inference_mode():
+        for images, sources, decode_ms, failed in loader:
+            pending.extend({'source': s, 'class': None, 'error': error} for s, error in failed)
+            if images is not None:
+                forward_start = time.perf_counter()
+                outputs = model(images)
+                forward_ms = (time.perf_counter() - forward_start) * 1000 / len(sources)
+                probabilities = (torch.nn.functional.softmax(outputs, dim=1) * 100).numpy()
+                for source, probs, decode in zip(sources, probabilities, decode_ms):
+                    row = {'source': source, 'class': WEATHER_CLASSES[int(probs.argmax())]}
+                    row.update({f"prob_{c}": round(float(p), 4) for c, p in zip(WEATHER_CLASSES, probs)})
+                    row.update({'decode_ms': round(decode, 2), 'forward_ms': round(forward_ms, 2), 'error': None})
+                    pending.append(row)
+                    if history is not None:
+                        history.record(row['class'], probs, channel='cli', source=source,
+                                       model_version=model_version, latency_ms=decode + forward_ms)
+
+            processed += len(sources) + len(failed)
+            if len(pending) >= flush_every * loader.batch_size:
+                writer.write(pending)
+                pending = []
+            elapsed = time.perf_counter() - start
+            print(f"\r🚀 {processed}/{total} images, {processed / elapsed:.1f} img/s", end='', flush=True)
+    writer.write(pending)
+    print()
+    return processed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="directory, glob pattern, or .tar/.zip archive of images")
+    parser.add_argument('--output', required=True, help="results file (.jsonl/.csv) or Parquet directory")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, help="output format (default: from extension)")
+    parser.add_argument('--weights', default='best_model.pth')
+    parser.add_argument('--arch', default='efficientnet_b7', choices=ARCHITECTURES)
+    parser.add_argument('--precision', default='fp32', choices=('fp32', 'int8-dynamic', 'int8'))
+    parser.add_argument('--backend', default='eager', choices=('eager', 'torchscript', 'onnxruntime'))
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1),
+                        help="parallel decode/preprocess workers")
+    parser.add_argument('--history-dir', default=HISTORY_DIR, help="prediction history directory ('' disables)")
+    args = parser.parse_args(argv)
+
+    writer = ResultWriter(args.output, output_format(args.output, args.format))
+    items = list_sources(args.source)
+    done = writer.done_sources()
+    todo = [item for item in items if source_id(item) not in done]
+    print(f"📂 {len(items)} images found, {len(items) - len(todo)} already classified, {len(todo)} to go")
+    if not todo:
+        return 0
+
+    model = load_model(args.weights, precision=args.precision, backend=args.backend, arch=args.arch)
+    loader = DataLoader(
+        ImageSourceDataset(todo),
+        batch_size=args.batch_size,
+        num_workers=args.workers,
+        collate_fn=collate,
+        persistent_workers=args.workers > 0,
+        prefetch_factor=4 if args.workers > 0 else None,
+    )
+    history = HistoryWriter(args.history_dir) if args.history_dir else None
+    start = time.perf_counter()
+    processed = classify(model, loader, writer, len(todo), history=history)
+    if history is not None:
+        history.close()
+    elapsed = time.perf_counter() - start
+    print(f"✅ Classified {processed} images in {elapsed:.1f}s ({processed / elapsed:.1f} img/s) -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Distill the EfficientNet-B7 weather classifier into a small, fast student model.
+
+The B7 from `load_model` labels a local folder of sky images once (soft
+labels are cached), then the student is trained to match its temperature-
+softened probabilities. Held-out images measure how often the student
+agrees with the teacher. If images sit in sub-folders named after
+WEATHER_CLASSES, true accuracy is reported for both models as well.
+
+    python distill.py --images sky_images/ --arch mobilenet_v3_large --epochs 10
+    # then serve it:  load_model('student_mobilenet_v3_large.pth', arch='mobilenet_v3_large')
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset
+
+from classify_images import ImageSourceDataset, collate, list_sources, source_id
+from model_utils import STUDENT_ARCHITECTURES, WEATHER_CLASSES, build_model, load_model
+import quantization
+
+
+class IndexedImages(Dataset):
+    """Preprocessed images with their index (to look up the teacher's soft labels)."""
+
+    def __init__(self, items, indices, augment=False):
+        self.images = ImageSourceDataset(items)
+        self.indices = indices
+        self.augment = augment
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, i):
+        index = self.indices[i]
+        _, tensor, _, _ = self.images[index]
+        if self.augment and torch.rand(()) < 0.5:
+            tensor = tensor.flip(-1)  # horizontal flips don't change the weather
+        return index, tensor
+
+
+def folder_label(item):
+    """Class index from the image's parent folder name, or -1 if it isn't a class name."""
+    parent = os.path.basename(os.path.dirname(source_id(item).split('::')[-1])).lower()
+    names = [c.lower() for c in WEATHER_CLASSES]
+    return names.index(parent) if parent in names else -1
+
+
+def teacher_logits(teacher, items, batch_size, workers, cache_path):
+    """B7 logits for every image, cached to `cache_path` so reruns skip the teacher."""
+    sources = np.array([source_id(item) for item in items])
+    if cache_path and os.path.exists(cache_path):
+        cached = np.load(cache_path)
+        if np.array_equal(cached['sources'], sources):
+            print(f"🗃️ Reusing teacher soft labels from {cache_path}")
+            return cached['logits'], cached['valid']
+
+    logits = np.zeros((len(items), len(WEATHER_CLASSES)), dtype=np.float32)
+    valid = np.zeros(len(items), dtype=bool)
+    position = {s: i for i, s in enumerate(sources)}
+    loader = DataLoader(ImageSourceDataset(items), batch_size=batch_size, num_workers=workers, collate_fn=collate)
+    done = 0
+    with torch.inference_mode():
+        for images, batch_sources, _, failed in loader:
+            if images is not None:
+                rows = [position[s] for s in batch_sources]
+                logits[rows] = teacher(images).numpy()
+                valid[rows] = True
+            done += len(batch_sources) + len(failed)
+            print(f"\r🧑‍🏫 Teacher labelled {done}/{len(items)} images", end='', flush=True)
+    print()
+    if cache_path:
+        np.savez(cache_path, sources=sources, logits=logits, valid=valid)
+    return logits, valid
+
+
+def distillation_loss(student_logits, teacher_logits, temperature):
+    """KL divergence between temperature-softened distributions (Hinton et al.), scaled by T²."""
+    return F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher_logits / temperature, dim=1),
+        reduction='batchmean',
+    ) * temperature ** 2
+
+
+def evaluate(student, loader, logits, labels):
+    """Student/teacher agreement, plus true accuracies where folder labels exist."""
+    agree = total = student_correct = teacher_correct = labelled = 0
+    student.eval()
+    with torch.inference_mode():
+        for indices, images in loader:
+            predictions = student(images).argmax(dim=1).numpy()
+            indices = indices.numpy()
+            teacher_predictions = logits[indices].argmax(axis=1)
+            agree += int((predictions == teacher_predictions).sum())
+            total += len(indices)
+            known = labels[indices] >= 0
+            labelled += int(known.sum())
+            student_correct += int((predictions[known] == labels[indices][known]).sum())
+            teacher_correct += int((teacher_predictions[known] == labels[indices][known]).sum())
+    report = {'agreement': agree / max(total, 1)}
+    if labelled:
+        report['student_accuracy'] = student_correct / labelled
+        report['teacher_accuracy'] = teacher_correct / labelled
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', required=True, help="folder, glob or archive of sky images")
+    parser.add_argument('--arch', default='mobilenet_v3_large', choices=sorted(STUDENT_ARCHITECTURES))
+    parser.add_argument('--teacher', default='best_model.pth', help="B7 teacher weights")
+    parser.add_argument('--output', help="student weights (default: student_<arch>.pth)")
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--temperature', type=float, default=4.0)
+    parser.add_argument('--val-fraction', type=float, default=0.1)
+    parser.add_argument('--workers', type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument('--no-pretrained', action='store_true', help="don't start from ImageNet weights")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    output = args.output or f"student_{args.arch}.pth"
+    torch.manual_seed(args.seed)
+
+    items = list_sources(args.images)
+    if not items:
+        print(f"❌ No images found in {args.images}")
+        return 1
+
+    teacher = load_model(args.teacher)
+    logits, valid = teacher_logits(teacher, items, args.batch_size, args.workers, f"{output}.teacher.npz")
+    labels = np.array([folder_label(item) for item in items])
+
+    usable = np.flatnonzero(valid)
+    np.random.RandomState(args.seed).shuffle(usable)
+    val_count = max(1, int(len(usable) * args.val_fraction)) if len(usable) > 1 else 0
+    val_indices, train_indices = usable[:val_count].tolist(), usable[val_count:].tolist()
+    print(f"📚 {len(train_indices)} training / {len(val_indices)} held-out images")
+
+    try:
+        student = build_model(arch=args.arch, pretrained_backbone=not args.no_pretrained)
+    except Exception as e:
+        print(f"⚠️ Couldn't fetch ImageNet weights ({e}), starting {args.arch} from scratch")
+        student = build_model(arch=args.arch)
+
+    train_loader = DataLoader(IndexedImages(items, train_indices, augment=True), batch_size=args.batch_size,
+                              shuffle=True, num_workers=args.workers, drop_last=len(train_indices) > args.batch_size)
+    val_loader = DataLoader(IndexedImages(items, val_indices), batch_size=args.batch_size, num_workers=args.workers)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.lr, weight_decay=1e-4)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(1, args.epochs * len(train_loader)))
+    teacher_logits_tensor = torch.from_numpy(logits)
+
+    best = -1.0
+    for epoch in range(1, args.epochs + 1):
+        student.train()
+        start, running = time.perf_counter(), 0.0
+        for indices, images in train_loader:
+            loss = distillation_loss(student(images), teacher_logits_tensor[indices], args.temperature)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            scheduler.step()
+            running += loss.item()
+
+        report = evaluate(student, val_loader, logits, labels) if val_indices else {'agreement': 0.0}
+        score = report.get('student_accuracy', report['agreement'])
+        summary = ", ".join(f"{k} {v:.1%}" for k, v in report.items())
+        print(f"🏋️ Epoch {epoch}/{args.epochs}: loss {running / max(len(train_loader), 1):.4f}, "
+              f"{summary} ({time.perf_counter() - start:.0f}s)")
+        if score >= best:
+            best = score
+            torch.save(student.state_dict(), output)
+
+    student = load_model(output, arch=args.arch)
+    teacher_ms = quantization.measure_latency_ms(teacher)
+    student_ms = quantization.measure_latency_ms(student)
+    print(f"✅ Saved {args.arch} student to {output}: {student_ms:.1f} ms vs B7 {teacher_ms:.1f} ms "
+          f"({teacher_ms / student_ms:.1f}x faster), best held-out score {best:.1%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+import fcntl
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import torch
+
+# Cosine similarity from which two images count as near-duplicates
+DUPLICATE_THRESHOLD = 0.97
+# Rows scored per matrix-vector product
+CHUNK_ROWS = 65536
+
+
+class EmbeddingStore:
+    """Append-only store of image embeddings with top-k cosine search.
+
+    Vectors are L2-normalized and appended as float16 rows to one raw file
+    that is memory-mapped for search, so cosine similarity is a chunked
+    float16 matrix-vector product and only the top-k rows are looked up in the
+    sidecar sqlite index (key, source, class, confidence, time). Each model
+    version gets its own pair of files in `directory`, because embeddings of
+    different models aren't comparable.
+
+    Several processes may share `directory`: appends are serialized by an
+    exclusive lock on a sidecar lock file, and each one takes its row numbers
+    from the index under that lock.
+    """
+
+    def __init__(self, directory, model_version, duplicate_threshold=DUPLICATE_THRESHOLD):
+        os.makedirs(directory, exist_ok=True)
+        name = hashlib.blake2b(str(model_version).encode(), digest_size=6).hexdigest()
+        self.matrix_path = os.path.join(directory, f"{name}.f16")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.model_version = model_version
+        self.duplicate_threshold = duplicate_threshold
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._db = sqlite3.connect(os.path.join(directory, f"{name}.sqlite"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "row INTEGER PRIMARY KEY, key TEXT UNIQUE, source TEXT, class TEXT, confidence REAL, created REAL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute("INSERT OR IGNORE INTO meta VALUES ('model_version', ?)", (str(model_version),))
+        self._db.commit()
+        self.dim = None
+        self.rows = 0
+        self._refresh()
+
+    def _refresh(self):
+        """Re-read the dimension and row count, which other processes may have changed."""
+        dim = self._db.execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+        self.dim = int(dim[0]) if dim else None
+        self.rows = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def __len__(self):
+        return self.rows
+
+    def add(self, embeddings, keys, classes, confidences, sources=None):
+        """Append N embeddings with their metadata; keys already stored are skipped. Returns rows added."""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(keys), -1)
+        sources = sources if sources is not None else [None] * len(keys)
+        with self._lock, open(self.lock_path, 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self._refresh()
+            self._matrix = None
+            try:
+                if self.dim is None:
+                    self._db.execute("INSERT OR REPLACE INTO meta VALUES ('dim', ?)", (str(embeddings.shape[1]),))
+                elif embeddings.shape[1] != self.dim:
+                    raise ValueError(f"❌ Embedding size {embeddings.shape[1]} doesn't match the store's {self.dim}")
+
+                seen = set()
+                new = []
+                for i, key in enumerate(keys):
+                    if key in seen or self._db.execute("SELECT 1 FROM embeddings WHERE key = ?", (key,)).fetchone():
+                        continue
+                    seen.add(key)
+                    new.append(i)
+                if not new:
+                    self._db.commit()
+                    return 0
+
+                vectors = embeddings[new]
+                vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+                # Rows past the index are left over from a writer that failed or crashed:
+                # overwrite them, so row numbers always match the index
+                with open(self.matrix_path, 'ab') as f:
+                    f.truncate(self.rows * embeddings.shape[1] * 2)
+                    f.write(vectors.astype(np.float16).tobytes())
+                now = time.time()
+                self._db.executemany(
+                    "INSERT INTO embeddings VALUES (?, ?, ?, ?, ?, ?)",
+                    [(self.rows + j, keys[i], sources[i], classes[i], float(confidences[i]), now)
+                     for j, i in enumerate(new)],
+                )
+                self._db.commit()
+            except BaseException:
+                self._db.rollback()
+                raise
+            finally:
+                self._refresh()
+        return len(new)
+
+    def _matrix_view(self):
+        if self._matrix is None or self._matrix.shape[0] != self.rows:
+            # Copy-on-write mapping: read-only on disk, but a writable array as torch.from_numpy expects
+            self._matrix = np.memmap(self.matrix_path, dtype=np.float16, mode='c', shape=(self.rows, self.dim))
+        return self._matrix
+
+    def _top_k(self, query, k, exclude_row=None):
+        query = torch.from_numpy(np.asarray(query, dtype=np.float32).reshape(-1))
+        query = (query / query.norm().clamp_min(1e-12)).half()
+        with self._lock:
+            self._refresh()
+            if not self.rows:
+                return []
+            matrix = self._matrix_view()
+        wanted = k + (exclude_row is not None)
+        best_scores, best_rows = [], []
+        for start in range(0, matrix.shape[0], CHUNK_ROWS):
+            # float16 matrix-vector product straight on the mapped rows: no conversion pass
+            chunk = torch.from_numpy(matrix[start:start + CHUNK_ROWS])
+            scores, rows = torch.topk((chunk @ query).float(), min(wanted, chunk.shape[0]))
+            best_scores.append(scores)
+            best_rows.append(rows + start)
+        scores, order = torch.topk(torch.cat(best_scores), min(wanted, sum(len(s) for s in best_scores)))
+        rows = torch.cat(best_rows)[order]
+        return [(int(row), float(score)) for row, score in zip(rows, scores) if row != exclude_row][:k]
+
+    def _describe(self, matches):
+        results = []
+        for row, score in matches:
+            with self._lock:
+                key, source, class_name, confidence, created = self._db.execute(
+                    "SELECT key, source, class, confidence, created FROM embeddings WHERE row = ?", (row,)
+                ).fetchone()
+            results.append({
+                'row': row,
+                'similarity': score,
+                'duplicate': score >= self.duplicate_threshold,
+                'key': key,
+                'source': source,
+                'class': class_name,
+                'confidence': confidence,
+                'created': created,
+            })
+        return results
+
+    def search(self, embedding, k=5):
+        """The k stored images most similar (cosine) to `embedding`, best first, with their metadata."""
+        return self._describe(self._top_k(embedding, k))
+
+    def search_key(self, key, k=5):
+        """Like `search`, for an image already in the store (by its cache key), excluding itself.
+
+        Needs no forward pass, so it also works when the prediction came from the cache.
+        """
+        with self._lock:
+            self._refresh()
+            row = self._db.execute("SELECT row FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return []
+            embedding = np.asarray(self._matrix_view()[row[0]], dtype=np.float32)
+        return self._describe(self._top_k(embedding, k, exclude_row=row[0]))
+
+    def stats(self):
+        return {
+            'rows': self.rows,
+            'dim': self.dim,
+            'megabytes': os.path.getsize(self.matrix_path) / 2**20 if os.path.exists(self.matrix_path) else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._matrix = None
+            self._db.close()
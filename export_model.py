@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Export the fine-tuned weather model to TorchScript / ONNX and check parity with eager."""
+
+import argparse
+import os
+import sys
+
+import torch
+from PIL import Image
+
+from model_utils import ARCHITECTURES, load_model, list_image_files, preprocess_images
+import runtime_backends
+
+
+def export_torchscript(model, path):
+    """Trace the eager model and save it as TorchScript."""
+    with torch.no_grad():
+        traced = torch.jit.trace(model, torch.randn(1, 3, 224, 224))
+    traced.save(path)
+
+
+def export_onnx(model, path):
+    """Export the eager model to ONNX with a dynamic batch dimension."""
+    batch = torch.export.Dim('batch', min=1, max=256)
+    torch.onnx.export(
+        model,
+        (torch.randn(2, 3, 224, 224),),
+        path,
+        input_names=['image'],
+        output_names=['logits'],
+        dynamic_shapes=({0: batch},),
+        external_data=False,
+    )
+
+
+EXPORTERS = {
+    'torchscript': export_torchscript,
+    'onnxruntime': export_onnx,
+}
+
+
+def load_samples(samples_dir, num_samples):
+    """Preprocessed sample batches from a folder, or random inputs if it has no images."""
+    paths = list_image_files(samples_dir)[:num_samples] if samples_dir else []
+    if not paths:
+        print(f"⚠️ No sample images found, checking parity on {num_samples} random inputs")
+        return [torch.randn(num_samples, 3, 224, 224)]
+    images = (Image.open(path).convert('RGB') for path in paths)
+    return list(preprocess_images(images, batch_size=8))
+
+
+def check_parity(model, backend, samples, atol):
+    """Compare backend logits with eager logits; return (max abs diff, argmax agreement)."""
+    max_diff = 0.0
+    agree = total = 0
+    with torch.no_grad():
+        for batch in samples:
+            expected = model(batch)
+            actual = backend(batch)
+            max_diff = max(max_diff, (expected - actual).abs().max().item())
+            agree += (expected.argmax(dim=1) == actual.argmax(dim=1)).sum().item()
+            total += batch.shape[0]
+    return max_diff, agree / total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--weights', default='best_model.pth', help="fine-tuned state dict")
+    parser.add_argument('--arch', default='efficientnet_b7', choices=ARCHITECTURES)
+    parser.add_argument('--format', nargs='+', choices=sorted(EXPORTERS), default=sorted(EXPORTERS),
+                        help="backends to export for")
+    parser.add_argument('--output-dir', default=runtime_backends.EXPORT_DIR)
+    parser.add_argument('--samples', default='calibration_images',
+                        help="folder of sample sky images for the parity check")
+    parser.add_argument('--num-samples', type=int, default=16)
+    parser.add_argument('--atol', type=float, default=1e-3,
+                        help="maximum allowed absolute logit difference from eager")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    model = load_model(args.weights, arch=args.arch)
+    samples = load_samples(args.samples, args.num_samples)
+
+    failed = False
+    for backend in args.format:
+        path = runtime_backends.exported_path(backend, args.output_dir)
+        print(f"📦 Exporting {backend} model to {path}...")
+        EXPORTERS[backend](model, path)
+
+        max_diff, agreement = check_parity(model, runtime_backends.load_backend(backend, path), samples, args.atol)
+        ok = max_diff <= args.atol and agreement == 1.0
+        failed = failed or not ok
+        print(f"{'✅' if ok else '❌'} {backend}: max |Δlogit| = {max_diff:.2e}, "
+              f"argmax agreement = {agreement:.1%}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""Multi-process inference engine with a pinned thread budget per worker.
+
+Each worker process holds its own model and runs with
+`torch.set_num_threads(threads_per_worker)`, so N workers x T threads never
+oversubscribe the host. Batches reach workers through shared memory:
+`pool.preprocess(images)` decodes straight into a shared-memory tensor, so
+nothing is copied on the way to the worker.
+
+    python inference_pool.py --autotune            # find the best workers x threads split
+    python inference_pool.py --workers 8 --threads 4 --batch-size 16
+"""
+
+import argparse
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import torch
+import torch.multiprocessing as mp
+
+from model_utils import PREPROCESSOR, load_model
+
+
+def _worker_main(worker_id, threads, model_kwargs, tasks, results):
+    """Worker process: load the model once, then answer batches until told to stop."""
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    try:
+        model = load_model(**model_kwargs)
+    except Exception as e:
+        results.put(('error', worker_id, repr(e)))
+        return
+    results.put(('ready', worker_id, None))
+
+    with torch.inference_mode():
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            job_id, batch = task
+            try:
+                outputs = model(batch)
+                probabilities = (torch.nn.functional.softmax(outputs, dim=1) * 100).numpy()
+                results.put(('done', job_id, probabilities))
+            except Exception as e:
+                results.put(('failed', job_id, repr(e)))
+            del batch  # release the shared-memory block as soon as possible
+
+
+class InferencePool:
+    """Runs `num_workers` model processes with `threads_per_worker` intra-op threads each.
+
+    `submit` returns a `concurrent.futures.Future` resolving to the N x C
+    probability matrix (percent, like `predict_weather_batch`), so several
+    sessions or jobs can share one pool.
+    """
+
+    def __init__(self, num_workers=None, threads_per_worker=1, model_kwargs=None, start_timeout=600):
+        cores = os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker
+        self.num_workers = num_workers or max(1, cores // threads_per_worker)
+        # Workers map one shared copy of the weights instead of loading one each
+        self.model_kwargs = {'share_weights': True, **(model_kwargs or {})}
+        model_path = self.model_kwargs.get('model_path', 'best_model.pth')
+        if self.model_kwargs['share_weights'] and os.path.exists(model_path):
+            # Write the shared file once here rather than racing in every worker
+            import shared_weights
+            shared_weights.ensure_shared_weights(model_path)
+
+        ctx = mp.get_context('spawn')
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count()
+        self._workers = [
+            ctx.Process(
+                target=_worker_main,
+                args=(i, threads_per_worker, self.model_kwargs, self._tasks, self._results),
+                daemon=True,
+            )
+            for i in range(self.num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+        self._wait_until_ready(start_timeout)
+
+        self._collector = threading.Thread(target=self._collect, daemon=True)
+        self._collector.start()
+
+    def _wait_until_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        ready = 0
+        while ready < self.num_workers:
+            try:
+                kind, worker_id, detail = self._results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [w.pid for w in self._workers if not w.is_alive()]
+                if dead or time.monotonic() > deadline:
+                    self.close()
+                    reason = f"worker processes {dead} exited" if dead else "timed out"
+                    raise RuntimeError(f"❌ Inference pool failed to start: {reason}")
+                continue
+            if kind == 'error':
+                self.close()
+                raise RuntimeError(f"❌ Inference worker {worker_id} failed to load the model: {detail}")
+            ready += 1
+
+    def _collect(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                break
+            kind, job_id, payload = message
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+            if future is None:
+                continue
+            if kind == 'done':
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"❌ Inference failed in worker: {payload}"))
+
+    @staticmethod
+    def preprocess(images):
+        """Preprocess PIL images directly into a shared-memory N x 3 x 224 x 224 tensor."""
+        images = list(images)
+        batch = torch.empty((len(images), 3, PREPROCESSOR.crop, PREPROCESSOR.crop)).share_memory_()
+        for i, image in enumerate(images):
+            PREPROCESSOR.to_array(PREPROCESSOR.load(image), out=batch[i].numpy())
+        return batch
+
+    def submit(self, batch):
+        """Queue a preprocessed batch; tensors not already in shared memory are moved there."""
+        batch.share_memory_()
+        future = Future()
+        job_id = next(self._job_ids)
+        with self._lock:
+            self._futures[job_id] = future
+        self._tasks.put((job_id, batch))
+        return future
+
+    def predict(self, batch):
+        """Blocking helper: probabilities for one preprocessed batch."""
+        return self.submit(batch).result()
+
+    def close(self):
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+        self._results.put(None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def measure_throughput(pool, batch_size=16, duration=10.0):
+    """Images per second with every worker kept busy on synthetic batches."""
+    batch = torch.randn(batch_size, 3, 224, 224).share_memory_()
+    in_flight = [pool.submit(batch) for _ in range(pool.num_workers * 2)]  # warm-up
+    for future in in_flight:
+        future.result()
+
+    done = 0
+    start = time.perf_counter()
+    in_flight = [pool.submit(batch) for _ in range(pool.num_workers * 2)]
+    while time.perf_counter() - start < duration:
+        in_flight.pop(0).result()
+        done += batch_size
+        in_flight.append(pool.submit(batch))
+    for future in in_flight:
+        future.result()
+        done += batch_size
+    return done / (time.perf_counter() - start)
+
+
+def candidate_configs(cores):
+    """Every (workers, threads per worker) split that uses exactly `cores` cores."""
+    return [(cores // threads, threads) for threads in range(1, cores + 1) if cores % threads == 0]
+
+
+def autotune(cores=None, batch_size=16, duration=10.0, model_kwargs=None):
+    """Benchmark each workers x threads split of the host and return the fastest one."""
+    cores = cores or os.cpu_count() or 1
+    results = []
+    for workers, threads in candidate_configs(cores):
+        with InferencePool(workers, threads, model_kwargs) as pool:
+            throughput = measure_throughput(pool, batch_size, duration)
+        results.append((throughput, workers, threads))
+        print(f"⚙️ {workers:>3} workers x {threads:>2} threads: {throughput:8.1f} img/s")
+    best = max(results)
+    print(f"🏆 Best: {best[1]} workers x {best[2]} threads ({best[0]:.1f} img/s)")
+    return {'workers': best[1], 'threads_per_worker': best[2], 'images_per_second': best[0]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weights', default='best_model.pth')
+    parser.add_argument('--autotune', action='store_true', help="try every workers x threads split")
+    parser.add_argument('--cores', type=int, default=os.cpu_count())
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--threads', type=int, default=1, help="intra-op threads per worker")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per measurement")
+    args = parser.parse_args(argv)
+
+    model_kwargs = {'model_path': args.weights}
+    if args.autotune:
+        autotune(args.cores, args.batch_size, args.duration, model_kwargs)
+        return
+    with InferencePool(args.workers, args.threads, model_kwargs) as pool:
+        throughput = measure_throughput(pool, args.batch_size, args.duration)
+    print(f"🚀 {pool.num_workers} workers x {args.threads} threads: {throughput:.1f} img/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Headless HTTP inference service with dynamic micro-batching.
+
+    python inference_server.py --port 8080 --max-batch-size 16 --max-wait-ms 10
+    curl -F image=@sky.jpg http://localhost:8080/predict
+
+Endpoints:
+    POST /predict   image upload (multipart field "image" or raw body) -> JSON probabilities
+    GET  /healthz   liveness: the process is up
+    GET  /readyz    readiness: the model is loaded and warmed up, and the batcher is running
+                    (503 "loading" meanwhile, 503 "failed" with the error if loading failed)
+    GET  /metrics   Prometheus metrics (latency histograms, predictions per class, ...)
+    GET  /metrics.json  the same metrics as a JSON snapshot with p50/p90/p99
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import torch
+from aiohttp import web
+
+from model_utils import ARCHITECTURES, PREPROCESSOR, WEATHER_CLASSES, get_model_version, load_model, warm_up
+from ingestion import open_image
+import metrics
+from metrics import PREDICTIONS, STAGE_SECONDS
+from prediction_cache import PredictionCache, image_cache_key
+from prediction_history import HISTORY_DIR, HistoryWriter
+from cascade import CascadeModel, load_cascade
+
+MAX_UPLOAD_BYTES = 20 * 2**20
+
+
+class ServiceState:
+    """What the handlers share; filled in by the background model load after start-up."""
+
+    def __init__(self, cache=None, history=None):
+        self.batcher = None
+        self.model_version = None
+        self.load_error = None
+        self.loader_task = None
+        self.cache = cache
+        self.history = history
+
+
+STATE = web.AppKey('state', ServiceState)
+
+
+class DynamicBatcher:
+    """Groups concurrent requests into one forward pass.
+
+    A batch is run as soon as `max_batch_size` requests are waiting, or
+    `max_wait_ms` after the first request of the batch arrived, whichever
+    comes first. Forward passes run one at a time on a dedicated thread so
+    the event loop keeps accepting requests meanwhile.
+    """
+
+    def __init__(self, model, max_batch_size=16, max_wait_ms=10):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self._queue = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='forward')
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def predict(self, tensor):
+        """Queue one preprocessed 3 x 224 x 224 tensor; resolves to (probabilities, batch size, stage)."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((tensor, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            tensors = torch.stack([tensor for tensor, _ in batch])
+            try:
+                probabilities, stages = await loop.run_in_executor(self._executor, self._forward, tensors)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future), probs, stage in zip(batch, probabilities, stages):
+                if not future.done():
+                    future.set_result((probs, len(batch), stage))
+
+    def _forward(self, tensors):
+        with torch.inference_mode(), STAGE_SECONDS.time(stage='forward'):
+            if isinstance(self.model, CascadeModel):
+                outputs, stages = self.model.predict(tensors)
+            else:
+                outputs, stages = self.model(tensors), [None] * len(tensors)
+            return (torch.nn.functional.softmax(outputs, dim=1) * 100).numpy(), stages
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': self.requests / self.batches if self.batches else 0.0,
+            'queue_depth': self._queue.qsize() if self._queue is not None else 0,
+        }
+
+
+def _decode(data):
+    """Validate, decode and preprocess upload bytes (runs in a worker thread)."""
+    with STAGE_SECONDS.time(stage='decode'):
+        loaded = PREPROCESSOR.load(open_image(data, max_bytes=MAX_UPLOAD_BYTES))
+    return loaded, torch.from_numpy(PREPROCESSOR.to_array(loaded))
+
+
+async def _read_image_bytes(request):
+    if request.content_type.startswith('multipart/'):
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name == 'image':
+                return await part.read(decode=False)
+        raise web.HTTPBadRequest(text="multipart upload has no 'image' field")
+    data = await request.read()
+    if not data:
+        raise web.HTTPBadRequest(text="empty request body")
+    return data
+
+
+async def predict(request):
+    state = request.app[STATE]
+    if state.load_error is not None:
+        raise web.HTTPServiceUnavailable(text=f"model failed to load: {state.load_error}")
+    if state.batcher is None:
+        raise web.HTTPServiceUnavailable(text="model is still loading")
+    start = time.perf_counter()
+    data = await _read_image_bytes(request)
+    loop = asyncio.get_running_loop()
+    try:
+        loaded, tensor = await loop.run_in_executor(None, _decode, data)
+    except Exception as e:
+        raise web.HTTPBadRequest(text=f"cannot decode image: {e}")
+
+    cache = state.cache
+    key = image_cache_key(loaded, state.model_version) if cache is not None else None
+    cached = cache.get(key) if cache is not None else None
+    if cached is not None:
+        probs, batch_size, stage = cached[1], 0, 'cache'
+    else:
+        probs, batch_size, stage = await state.batcher.predict(tensor)
+        if cache is not None:
+            cache.put(key, probs.argmax(), probs)
+
+    pred = int(probs.argmax())
+    latency_ms = (time.perf_counter() - start) * 1000
+    PREDICTIONS.inc(**{'class': WEATHER_CLASSES[pred], 'channel': 'service'})
+    if state.history is not None:
+        state.history.record(WEATHER_CLASSES[pred], probs, channel='service', model_version=state.model_version,
+                             stage=stage, latency_ms=latency_ms)
+    return web.json_response({
+        'class': WEATHER_CLASSES[pred],
+        'confidence': float(probs[pred]),
+        'probabilities': {c: float(p) for c, p in zip(WEATHER_CLASSES, probs)},
+        'cached': cached is not None,
+        'stage': stage,
+        'batch_size': batch_size,
+        'latency_ms': latency_ms,
+    })
+
+
+async def metrics_text(request):
+    return web.Response(body=metrics.prometheus().encode(), headers={'Content-Type': metrics.PROMETHEUS_CONTENT_TYPE})
+
+
+async def metrics_json(request):
+    return web.json_response(metrics.snapshot())
+
+
+async def healthz(request):
+    return web.json_response({'status': 'ok'})
+
+
+async def readyz(request):
+    state = request.app[STATE]
+    batcher = state.batcher
+    if state.load_error is not None:
+        return web.json_response({'status': 'failed', 'error': state.load_error}, status=503)
+    if batcher is None or not batcher.running:
+        return web.json_response({'status': 'loading'}, status=503)
+    body = {'status': 'ready', 'model_version': state.model_version, **batcher.stats()}
+    if state.cache is not None:
+        body['cache'] = state.cache.stats()
+    if state.history is not None:
+        body['history'] = state.history.stats()
+    if isinstance(batcher.model, CascadeModel):
+        body['cascade'] = batcher.model.stats()
+    return web.json_response(body)
+
+
+def create_app(model=None, model_loader=None, max_batch_size=16, max_wait_ms=10, cache_entries=1024,
+               history_dir=None):
+    """Build the aiohttp application around `model`, or load one with `model_loader` at start-up.
+
+    Predictions are recorded to a prediction history in `history_dir`, if given.
+    """
+    app = web.Application(client_max_size=MAX_UPLOAD_BYTES)
+    # One object set before start-up and mutated afterwards: aiohttp freezes the app mapping once started
+    state = app[STATE] = ServiceState(
+        cache=PredictionCache(max_entries=cache_entries) if cache_entries else None,
+        history=HistoryWriter(history_dir) if history_dir else None,
+    )
+
+    async def start_batcher(app):
+        async def load():
+            loop = asyncio.get_running_loop()
+            loaded = model if model is not None else await loop.run_in_executor(None, model_loader)
+            # Until warmed up at single-image and full batch sizes, /readyz keeps answering 503
+            await loop.run_in_executor(None, partial(warm_up, loaded, batch_sizes=sorted({1, max_batch_size})))
+            batcher = DynamicBatcher(loaded, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+            batcher.start()
+            state.model_version = get_model_version(loaded)
+            state.batcher = batcher
+
+        def loaded(task):
+            if not task.cancelled() and task.exception() is not None:
+                error = task.exception()
+                state.load_error = f"{type(error).__name__}: {error}"
+                print(f"❌ Model failed to load: {state.load_error}", file=sys.stderr)
+
+        # Load in the background so /healthz answers (and /readyz says 503) meanwhile
+        state.loader_task = asyncio.get_running_loop().create_task(load())
+        state.loader_task.add_done_callback(loaded)
+
+    async def stop_batcher(app):
+        state.loader_task.cancel()
+        if state.batcher is not None:
+            await state.batcher.stop()
+        if state.history is not None:
+            await asyncio.get_running_loop().run_in_executor(None, state.history.close)
+
+    app.on_startup.append(start_batcher)
+    app.on_cleanup.append(stop_batcher)
+    app.router.add_post('/predict', predict)
+    app.router.add_get('/healthz', healthz)
+    app.router.add_get('/readyz', readyz)
+    app.router.add_get('/metrics', metrics_text)
+    app.router.add_get('/metrics.json', metrics_json)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--weights', default='best_model.pth')
+    parser.add_argument('--arch', default='efficientnet_b7', choices=ARCHITECTURES)
+    parser.add_argument('--precision', default='fp32', choices=('fp32', 'int8-dynamic', 'int8'))
+    parser.add_argument('--backend', default='eager', choices=('eager', 'torchscript', 'onnxruntime'))
+    parser.add_argument('--bf16', action='store_true', help="bfloat16 autocast (CPUs with native support)")
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=10)
+    parser.add_argument('--cache-entries', type=int, default=1024, help="0 disables the prediction cache")
+    parser.add_argument('--cascade-first-stage', help="student weights to answer confident images before B7")
+    parser.add_argument('--cascade-arch', default='mobilenet_v3_large', choices=ARCHITECTURES)
+    parser.add_argument('--cascade-threshold', type=float, default=0.9)
+    parser.add_argument('--history-dir', default=HISTORY_DIR, help="prediction history directory ('' disables)")
+    args = parser.parse_args(argv)
+
+    def model_loader():
+        if args.cascade_first_stage:
+            return load_cascade(args.cascade_first_stage, args.cascade_arch, args.weights,
+                                threshold=args.cascade_threshold, precision=args.precision, bf16=args.bf16)
+        return load_model(args.weights, precision=args.precision, backend=args.backend, arch=args.arch, bf16=args.bf16)
+
+    app = create_app(
+        model_loader=model_loader,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        cache_entries=args.cache_entries,
+        history_dir=args.history_dir,
+    )
+    web.run_app(app, host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+import io
+import os
+import warnings
+import zipfile
+import zlib
+from collections import namedtuple
+from functools import partial
+
+from PIL import Image, ImageOps
+
+from metrics import STAGE_SECONDS
+from model_utils import IMAGE_EXTENSIONS
+
+# Limits for one uploaded image; the pixel limit is checked from the header, before decoding
+MAX_IMAGE_BYTES = int(float(os.environ.get('WEATHER_MAX_IMAGE_MB', '20')) * 2**20)
+MAX_IMAGE_PIXELS = int(os.environ.get('WEATHER_MAX_IMAGE_PIXELS', str(40_000_000)))
+PREVIEW_SIZE = 512
+# Images in one multi-file / zip upload, and the size of one zip; keep maxUploadSize in .streamlit/config.toml in step
+MAX_BATCH_IMAGES = int(os.environ.get('WEATHER_MAX_BATCH_IMAGES', '500'))
+MAX_ZIP_BYTES = int(float(os.environ.get('WEATHER_MAX_ZIP_MB', '100')) * 2**20)
+
+# Formats the model accepts, with the leading bytes that identify them
+SIGNATURES = {
+    'JPEG': (b'\xff\xd8\xff',),
+    'PNG': (b'\x89PNG\r\n\x1a\n',),
+}
+
+IngestedImage = namedtuple('IngestedImage', 'image preview format original_size num_bytes')
+IngestedImage.__doc__ = """An accepted upload: `image` is model-sized (see ImagePreprocessor.fit), `preview` fits in PREVIEW_SIZE."""
+
+
+class ImageRejected(ValueError):
+    """Raised for uploads that are too large, not an accepted format, or undecodable."""
+
+
+def _too_large(num_bytes, max_bytes):
+    return ImageRejected(f"file is {num_bytes / 2**20:.1f} MB, the limit is {max_bytes / 2**20:.0f} MB")
+
+
+def open_image(data, max_bytes=MAX_IMAGE_BYTES, max_pixels=MAX_IMAGE_PIXELS, formats=tuple(SIGNATURES)):
+    """Validate upload bytes and open them lazily, without decoding any pixels.
+
+    Checks, cheapest first: byte size, file signature, then the dimensions in
+    the header against `max_pixels`. That last check also covers
+    decompression bombs, whose headers claim far more pixels than their
+    byte size suggests.
+    """
+    if not data:
+        raise ImageRejected("empty file")
+    if len(data) > max_bytes:
+        raise _too_large(len(data), max_bytes)
+    if not any(data.startswith(signature) for name in formats for signature in SIGNATURES[name]):
+        raise ImageRejected(f"not a {'/'.join(formats)} image")
+
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(io.BytesIO(data), formats=formats)
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as e:
+        raise ImageRejected(f"image has too many pixels: {e}") from e
+    except Exception as e:
+        raise ImageRejected(f"cannot read image header: {e}") from e
+
+    width, height = image.size
+    if width < 1 or height < 1:
+        raise ImageRejected("image has no pixels")
+    if width * height > max_pixels:
+        raise ImageRejected(f"image is {width}x{height} ({width * height / 1e6:.0f} MP), "
+                            f"the limit is {max_pixels / 1e6:.0f} MP")
+    return image
+
+
+def ingest(data, preprocessor, preview_size=PREVIEW_SIZE, **limits):
+    """Validate upload bytes and decode them into a model-sized image and a display preview.
+
+    JPEGs are decoded twice at reduced scale (draft mode), once for the model
+    and once for the preview, so the model input is identical to every other
+    entry point. Other formats are decoded once, within the pixel limit.
+    Keyword arguments are the limits of `open_image`.
+    """
+    image = open_image(data, **limits)
+    original_size = image.size
+    image_format = image.format
+    try:
+        with STAGE_SECONDS.time(stage='decode'):
+            if image_format == 'JPEG':
+                preview = open_image(data, **limits)
+                preview.draft('RGB', (preview_size, preview_size))
+            else:
+                image.load()
+                preview = image
+            model_image = preprocessor.fit(image)
+            preview = ImageOps.exif_transpose(preview)
+            preview.thumbnail((preview_size, preview_size))
+            if preview.mode not in ('RGB', 'RGBA', 'L'):
+                preview = preview.convert('RGB')
+    except Exception as e:
+        raise ImageRejected(f"cannot decode image: {e}") from e
+    return IngestedImage(model_image, preview, image_format, original_size, len(data))
+
+
+def _read_member(archive, info, max_bytes):
+    # The declared size is checked before decompressing; zipfile stops at that size too
+    if info.file_size > max_bytes:
+        raise _too_large(info.file_size, max_bytes)
+    # Corrupt data (bad CRC, truncated or broken deflate stream), encryption (RuntimeError)
+    # and unsupported compression methods (NotImplementedError) reject just this member
+    try:
+        return archive.read(info)
+    except (zipfile.BadZipFile, zlib.error, EOFError, OSError, RuntimeError) as e:
+        raise ImageRejected(f"cannot read archive member: {e}") from e
+
+
+def _reject(error):
+    raise error
+
+
+def _upload_size(file):
+    # Streamlit uploads carry their size; other in-memory files are measured without a copy
+    size = getattr(file, 'size', None)
+    return size if size is not None else len(file.getbuffer())
+
+
+def expand_uploads(files, max_images=MAX_BATCH_IMAGES, max_bytes=MAX_IMAGE_BYTES, max_zip_bytes=MAX_ZIP_BYTES):
+    """(name, read) pairs for uploaded files, with every image inside a zip archive listed separately.
+
+    `files` are in-memory file objects with `.name` and `.getvalue()`
+    (Streamlit uploads). Sizes are checked before any bytes are copied or
+    decompressed: `read()` returns one image's bytes when called, or raises
+    ImageRejected, e.g. for an image over `max_bytes`, a zip over
+    `max_zip_bytes`, or an archive that isn't a valid zip.
+    """
+    items = []
+    for file in files:
+        is_zip = file.name.lower().endswith('.zip')
+        size, limit = _upload_size(file), max_zip_bytes if is_zip else max_bytes
+        if size > limit:
+            items.append((file.name, partial(_reject, _too_large(size, limit))))
+            continue
+        if not is_zip:
+            items.append((file.name, file.getvalue))
+            continue
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(file.getvalue()))
+        except zipfile.BadZipFile:
+            items.append((file.name, partial(_reject, ImageRejected("not a valid zip archive"))))
+            continue
+        members = sorted((info for info in archive.infolist()
+                          if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)),
+                         key=lambda info: info.filename)
+        items.extend((f"{file.name}/{info.filename}", partial(_read_member, archive, info, max_bytes))
+                     for info in members)
+        if len(items) > max_images:
+            break
+    if len(items) > max_images:
+        raise ImageRejected(f"more than {max_images} images in one upload")
+    return items
@@ -0,0 +1,270 @@
+"""Runtime metrics: counters, gauges and latency histograms with Prometheus text and JSON output.
+
+    from metrics import STAGE_SECONDS
+    with STAGE_SECONDS.time(stage='forward'):
+        outputs = model(batch)
+
+`inference_server.py` serves them at /metrics and /metrics.json; other
+processes (e.g. the Streamlit app) can start a small exporter with
+`serve(port)` or WEATHER_METRICS_PORT.
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 0.5 ms to ~29 s in steps of 1.5x: fine enough for p99 estimates within one step
+LATENCY_BUCKETS = tuple(round(0.0005 * 1.5 ** i, 6) for i in range(28))
+QUANTILES = (0.5, 0.9, 0.99)
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _label_text(labelnames, values, extra=()):
+    pairs = [*zip(labelnames, values), *extra]
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"❌ {self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count per label set."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return dict(self._values)
+
+    def prometheus(self):
+        lines = self._header()
+        lines += [f"{self.name}{_label_text(self.labelnames, key)} {value}" for key, value in sorted(self.samples().items())]
+        return lines
+
+    def snapshot(self):
+        return [{**dict(zip(self.labelnames, key)), 'value': value} for key, value in sorted(self.samples().items())]
+
+
+class Gauge(Counter):
+    """A value that goes up and down; with `function`, read from it at collection time.
+
+    Without labels `function` returns the value; with one label it returns
+    {label value: value}.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labelnames=(), function=None):
+        super().__init__(name, help_text, labelnames)
+        self.function = function
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        if self.function is None:
+            return super().samples()
+        if not self.labelnames:
+            return {(): self.function()}
+        return {(str(label),): value for label, value in self.function().items()}
+
+
+class Histogram(_Metric):
+    """Observations counted into fixed cumulative buckets, as Prometheus histograms are.
+
+    Observing is a bisect and three additions under a lock. Quantiles in the
+    JSON snapshot are interpolated within buckets, like PromQL's
+    histogram_quantile, so they are accurate to about one bucket step.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts, the last one for values above every bucket
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds spent in the `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+
+    def quantile(self, q, counts):
+        """Estimate the q-quantile from per-bucket `counts` (see `samples`)."""
+        rank = q * sum(counts)
+        seen = 0
+        for i, count in enumerate(counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return None
+
+    def prometheus(self):
+        lines = self._header()
+        for key, (counts, total, count) in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {count}")
+        return lines
+
+    def snapshot(self):
+        return [
+            {
+                **dict(zip(self.labelnames, key)),
+                'count': count,
+                'sum': total,
+                'mean': total / count,
+                **{f"p{round(q * 100)}": self.quantile(q, counts) for q in QUANTILES},
+            }
+            for key, (counts, total, count) in sorted(self.samples().items())
+        ]
+
+
+class Registry:
+    """Named metrics of one process; re-registering a name returns the existing metric."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(self._metrics[name], cls):
+                raise ValueError(f"❌ Metric {name} is already registered as a {self._metrics[name].kind}")
+            return self._metrics[name]
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name, help_text, labelnames=(), function=None):
+        return self._register(Gauge, name, help_text, labelnames, function=function)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(line for metric in metrics for line in metric.prometheus()) + '\n'
+
+    def snapshot(self):
+        """All metrics as a JSON-serializable dict, histograms summarized with quantiles."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {'time': time.time(), 'metrics': {metric.name: metric.snapshot() for metric in metrics}}
+
+
+REGISTRY = Registry()
+
+
+def _tts_queue_depth():
+    from speech import tts_queue_depth
+    return tts_queue_depth()
+
+
+# Shared metrics, recorded into by the modules named in their help text
+STAGE_SECONDS = REGISTRY.histogram(
+    'weather_stage_seconds',
+    "Latency of pipeline stages: decode and preprocess per image, forward per pass, render per result",
+    ['stage'],
+)
+PREDICTIONS = REGISTRY.counter('weather_predictions_total', "Predictions by class and entry point", ['class', 'channel'])
+CACHE_LOOKUPS = REGISTRY.counter('weather_prediction_cache_lookups_total', "PredictionCache lookups by result", ['result'])
+MODEL_LOAD_SECONDS = REGISTRY.gauge('weather_model_load_seconds', "Time load_model took, by architecture", ['arch'])
+TTS_QUEUE_DEPTH = REGISTRY.gauge(
+    'weather_tts_queue_depth', "Jobs waiting for the TTS engine: announcements to speak, clips to render",
+    ['kind'], function=_tts_queue_depth,
+)
+
+
+def prometheus():
+    return REGISTRY.prometheus()
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = prometheus().encode(), PROMETHEUS_CONTENT_TYPE
+        elif self.path == '/metrics.json':
+            body, content_type = json.dumps(snapshot()).encode(), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host='0.0.0.0'):
+    """Serve /metrics and /metrics.json from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-exporter', daemon=True).start()
+    print(f"📈 Metrics on http://{host}:{port}/metrics")
+    return server
@@ -1,28 +1,92 @@
 import os
-import gdown
+import time
 import torch
 import torch.nn as nn
-from torchvision import models, transforms
 from PIL import Image
 import numpy as np
-import pyttsx3
-import threading
+from metrics import MODEL_LOAD_SECONDS, STAGE_SECONDS
+from prediction_cache import image_cache_key
+from preprocessing import ImagePreprocessor
+import profiling
+from speech import get_tts_worker, get_voice_announcement
+from startup_timing import STARTUP
 
 # Define weather class labels
 WEATHER_CLASSES = ['Cloudy', 'Rain', 'Shine', 'Sunrise']
 
-def load_model(model_path='best_model.pth'):
-    """Load the trained PyTorch model; download from Google Drive if needed."""
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Built once and shared: Resize(256) -> CenterCrop(224) -> ToTensor -> Normalize
+PREPROCESSOR = ImagePreprocessor(resize=256, crop=224)
+
+# Batch sizes the first real requests use: single images, and the app's batch grid / the service's max batch
+WARMUP_BATCH_SIZES = (1, 16)
+
+# Small student models distilled from the B7 teacher (distill.py), with the
+# index of the output layer in their torchvision `classifier`
+STUDENT_ARCHITECTURES = {
+    'efficientnet_b0': 1,
+    'mobilenet_v3_large': 3,
+    'mobilenet_v3_small': 3,
+}
+ARCHITECTURES = ('efficientnet_b7', *STUDENT_ARCHITECTURES)
+
+# Local folder of sky images used to calibrate static int8 quantization
+CALIBRATION_DIR = os.environ.get('WEATHER_CALIBRATION_DIR', 'calibration_images')
+
+def load_model(model_path='best_model.pth', precision='fp32', calibration_dir=None,
+               num_calibration_images=64, backend='eager', export_dir=None,
+               share_weights=False, arch='efficientnet_b7', fold_bn=None, channels_last=None, bf16=False):
+    """Load the trained PyTorch model; download from Google Drive if needed.
+
+    `precision` is 'fp32' (default), 'int8-dynamic' (int8 Linear head only)
+    or 'int8' (FX static int8 conv trunk calibrated on `calibration_dir`,
+    plus the dynamic int8 head). Quantized models print their size and
+    latency next to the fp32 baseline and keep it in `model.quantization_report`.
+
+    `backend` picks the runtime: 'eager' (default), or 'torchscript' /
+    'onnxruntime' to load an artifact made by export_model.py from `export_dir`.
+
+    `arch` selects the architecture the weights belong to: the fine-tuned
+    'efficientnet_b7' (default) or a student distilled by distill.py, e.g.
+    load_model('student_mobilenet_v3_large.pth', arch='mobilenet_v3_large').
+
+    With `share_weights=True` the parameters are views of one read-only
+    memory-mapped file (see shared_weights.py), so every process loading the
+    model shares a single copy of the weights. Quantizing makes private copies.
+
+    fp32 eager models go through `prepare_for_inference`: `fold_bn` and
+    `channels_last` default to on, except with `share_weights` (both copy the
+    weights); `bf16=True` adds bfloat16 autocast where the CPU supports it.
+
+    The total load time is recorded in the `weather_model_load_seconds` metric.
+    """
+    load_start = time.perf_counter()
+    if backend != 'eager':
+        if precision != 'fp32':
+            raise ValueError("❌ Exported backends are fp32; use precision='fp32'")
+        import runtime_backends
+        model = runtime_backends.load_backend(backend, export_dir=export_dir)
+        model.model_version = f"{_weights_version(model.path)}:{backend}"
+        return _loaded(model, arch, load_start)
 
     # Original link: https://drive.google.com/file/d/1hZCVZw1vJXUYODVLB-Ko76tLxDPe_4n8/view?usp=sharing
     # Extracted file ID:
     file_id = '1hZCVZw1vJXUYODVLB-Ko76tLxDPe_4n8'
     gdrive_url = f'https://drive.google.com/uc?id={file_id}'
 
+    if not os.path.exists(model_path) and arch != 'efficientnet_b7':
+        raise FileNotFoundError(
+            f"❌ No {arch} student weights at '{model_path}'.\n"
+            f"💡 Train one with `python distill.py --images <folder> --arch {arch}`."
+        )
+
     if not os.path.exists(model_path):
         try:
+            import gdown
             print("📥 Downloading model from Google Drive...")
-            gdown.download(gdrive_url, model_path, quiet=False)
+            with STARTUP.phase('download weights'):
+                gdown.download(gdrive_url, model_path, quiet=False)
         except Exception as e:
             raise RuntimeError(
                 f"❌ Failed to download model: {e}\n"
@@ -30,117 +94,369 @@ def load_model(model_path='best_model.pth'):
                 f"🔗 Your shared link: https://drive.google.com/file/d/{file_id}/view?usp=sharing"
             )
 
-    # Initialize EfficientNet-B7 model
-    model = models.efficientnet_b7(pretrained=False)
+    with STARTUP.phase('import torchvision'):
+        import torchvision.models  # noqa: F401  (imported lazily; a large share of cold start)
+    with STARTUP.phase('build architecture'):
+        model = build_model(device='meta', arch=arch)
+    with STARTUP.phase('read weights'):
+        if share_weights:
+            import shared_weights
+            state_dict = shared_weights.load_shared_state_dict(shared_weights.ensure_shared_weights(model_path))
+        else:
+            state_dict = read_weights(model_path)
+    with STARTUP.phase('load state dict'):
+        # assign=True adopts the loaded tensors instead of copying into freshly initialized ones
+        model.load_state_dict(state_dict, assign=True)
+    model.eval()
+    model.model_version = _weights_version(model_path)
+
+    if precision != 'fp32':
+        model = _quantize(model, precision, calibration_dir or CALIBRATION_DIR, num_calibration_images)
+        return _loaded(model, arch, load_start)
+    # Folding and channels_last write new weight tensors, which would un-share shared weights
+    with STARTUP.phase('prepare for inference'):
+        model = prepare_for_inference(
+            model,
+            fold_bn=not share_weights if fold_bn is None else fold_bn,
+            channels_last=not share_weights if channels_last is None else channels_last,
+            bf16=bf16,
+        )
+    return _loaded(model, arch, load_start)
+
+def _loaded(model, arch, load_start):
+    MODEL_LOAD_SECONDS.set(time.perf_counter() - load_start, arch=arch)
+    return model
+
+def _quantize(model, precision, calibration_dir, num_calibration_images):
+    """Quantize a loaded fp32 model and attach the size/latency report."""
+    import quantization
+
+    calibration_batches = None
+    if precision == 'int8':
+        paths = list_image_files(calibration_dir)[:num_calibration_images]
+        if not paths:
+            raise ValueError(
+                f"❌ No calibration images found in '{calibration_dir}'.\n"
+                f"💡 Put a few dozen representative sky images there or set WEATHER_CALIBRATION_DIR."
+            )
+        images = (Image.open(path).convert('RGB') for path in paths)
+        calibration_batches = preprocess_images(images, batch_size=8)
+
+    quantized = quantization.quantize_model(model, precision, calibration_batches)
+    quantized.quantization_report = quantization.compare_precisions(model, quantized, precision)
+    quantized.model_version = f"{model.model_version}:{precision}"
+    return quantized
+
+def bf16_supported():
+    """Whether oneDNN has native bfloat16 kernels on this CPU (AVX512-BF16 / AMX)."""
+    return torch.backends.mkldnn.is_available() and torch.ops.mkldnn._is_mkldnn_bf16_supported()
+
+def fold_batch_norms(model):
+    """Fold each BatchNorm2d that directly follows a Conv2d (e.g. Conv2dNormActivation) into the conv.
+
+    The conv gets the scaled weights and a bias, and the BatchNorm becomes an
+    Identity, which removes one full pass over every activation map. Only
+    valid in eval mode. Returns the number of folded pairs.
+    """
+    from torch.nn.utils.fusion import fuse_conv_bn_eval
+
+    if model.training:
+        raise ValueError("❌ BatchNorm can only be folded in eval mode")
+    folded = 0
+    for module in list(model.modules()):
+        if not isinstance(module, nn.Sequential):
+            continue
+        names = list(module._modules)
+        for first, second in zip(names, names[1:]):
+            conv, bn = module._modules[first], module._modules[second]
+            if isinstance(conv, nn.Conv2d) and isinstance(bn, nn.BatchNorm2d):
+                module._modules[first] = fuse_conv_bn_eval(conv, bn)
+                module._modules[second] = nn.Identity()
+                folded += 1
+    return folded
+
+def prepare_for_inference(model, fold_bn=True, channels_last=True, bf16=False):
+    """Turn an eval-mode model into an inference-only one, in place.
+
+    Parameters are always frozen. `fold_bn` folds BatchNorm into the
+    preceding convolutions, `channels_last` stores the conv weights NHWC
+    (the oneDNN-friendly layout, which activations then follow) and `bf16`
+    runs the forward pass under bfloat16 autocast, returning fp32 logits.
+    bf16 changes the numbers slightly, so it is part of `model_version`; it
+    is skipped with a warning on CPUs without native support.
+    """
+    model.eval()
     for param in model.parameters():
         param.requires_grad = False
-    for param in model.features[-2:].parameters():
-        param.requires_grad = True
-
-    # Modify classifier for your 4 weather classes
-    in_features = model.classifier[1].in_features
-    model.classifier[1] = nn.Sequential(
-        nn.Dropout(0.3),
-        nn.Linear(in_features, len(WEATHER_CLASSES))
+    options = []
+    if fold_bn:
+        fold_batch_norms(model)
+        options.append('fold_bn')
+    if channels_last:
+        model.to(memory_format=torch.channels_last)
+        options.append('channels_last')
+    if bf16 and not bf16_supported():
+        print("⚠️ This CPU has no native bfloat16 support, keeping fp32")
+    elif bf16:
+        forward = model.forward
+
+        def bf16_forward(*args, **kwargs):
+            with torch.autocast('cpu', dtype=torch.bfloat16):
+                return forward(*args, **kwargs).float()
+
+        model.forward = bf16_forward
+        model.model_version = f"{get_model_version(model)}:bf16"
+        options.append('bf16')
+    model.inference_options = tuple(options)
+    return model
+
+def warm_up(model, batch_sizes=WARMUP_BATCH_SIZES, passes=2):
+    """Run dummy forward passes so the first real prediction doesn't pay allocator and kernel warm-up.
+
+    Each batch size gets `passes` passes: the first sizes the allocator and
+    picks kernels, the second confirms the steady state. Both stages of a
+    cascade are warmed directly, leaving its escalation stats untouched.
+    """
+    from cascade import CascadeModel
+
+    models = [model.first_stage, model.second_stage] if isinstance(model, CascadeModel) else [model]
+    with STARTUP.phase('warm up'), torch.inference_mode():
+        for batch_size in batch_sizes:
+            images = torch.zeros(batch_size, 3, PREPROCESSOR.crop, PREPROCESSOR.crop)
+            for _ in range(passes):
+                for stage in models:
+                    stage(images)
+    return model
+
+def list_image_files(folder):
+    """Sorted paths of the images directly inside `folder` (empty if it doesn't exist)."""
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
     )
 
-    model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu')))
-    model.eval()
+def build_model(device=None, arch='efficientnet_b7', pretrained_backbone=False):
+    """Build a weather classifier architecture (4-class head) without its trained weights.
+
+    `arch` is the fine-tuned 'efficientnet_b7' teacher or one of the small
+    distilled students in STUDENT_ARCHITECTURES. On the 'meta' device no
+    memory is allocated and no random initialization runs; the parameters
+    must then be filled with `load_state_dict(..., assign=True)`.
+    `pretrained_backbone` starts a student from ImageNet weights (for training).
+    """
+    from torchvision import models
+
+    if arch != 'efficientnet_b7':
+        if arch not in STUDENT_ARCHITECTURES:
+            raise ValueError(f"❌ Unknown architecture '{arch}', expected one of {ARCHITECTURES}")
+        with torch.device(device or 'cpu'):
+            model = getattr(models, arch)(weights='DEFAULT' if pretrained_backbone else None)
+            # Replace the ImageNet output layer with the 4 weather classes
+            head = STUDENT_ARCHITECTURES[arch]
+            model.classifier[head] = nn.Linear(model.classifier[head].in_features, len(WEATHER_CLASSES))
+        return model
+
+    with torch.device(device or 'cpu'):
+        # Initialize EfficientNet-B7 model
+        model = models.efficientnet_b7(weights=None)
+
+        # Modify classifier for your 4 weather classes
+        in_features = model.classifier[1].in_features
+        model.classifier[1] = nn.Sequential(
+            nn.Dropout(0.3),
+            nn.Linear(in_features, len(WEATHER_CLASSES))
+        )
     return model
 
+def read_weights(model_path):
+    """Read a state dict, memory-mapping the file when its format allows it."""
+    try:
+        return torch.load(model_path, map_location='cpu', mmap=True, weights_only=True)
+    except RuntimeError:
+        # Legacy (non-zipfile) checkpoints can't be memory-mapped
+        return torch.load(model_path, map_location='cpu', weights_only=True)
+
+def _weights_version(model_path):
+    """Cheap identifier for a weights file (name, size and mtime)."""
+    stat = os.stat(model_path)
+    return f"{os.path.basename(model_path)}:{stat.st_size}:{int(stat.st_mtime)}"
+
+def get_model_version(model):
+    """Version string used to key cached predictions for `model`."""
+    return getattr(model, 'model_version', type(model).__name__)
+
 def preprocess_image(image):
     """Apply transformations to an image before prediction."""
-    transform = transforms.Compose([
-        transforms.Resize(256),
-        transforms.CenterCrop(224),
-        transforms.ToTensor(),
-        transforms.Normalize([0.485, 0.456, 0.406], 
-                             [0.229, 0.224, 0.225]),
-    ])
-    return transform(image).unsqueeze(0)
-
-def predict_weather(model, image):
-    """Predict weather category from image."""
-    with torch.no_grad():
-        outputs = model(image)
+    return PREPROCESSOR(image).unsqueeze(0)
+
+def has_embeddings(model):
+    """Whether `model` is a torchvision features -> avgpool -> classifier network (not a cascade or export)."""
+    return all(hasattr(model, name) for name in ('features', 'avgpool', 'classifier'))
+
+def forward_with_embedding(model, images):
+    """(logits, pooled penultimate features) in one forward pass; call under torch.inference_mode.
+
+    The embedding is the global-average-pooled output of `features` (2560
+    values for B7), the input of the classifier head.
+    """
+    with torch.autocast('cpu', dtype=torch.bfloat16, enabled='bf16' in getattr(model, 'inference_options', ())):
+        embeddings = torch.flatten(model.avgpool(model.features(images)), 1)
+        logits = model.classifier(embeddings)
+    return logits.float(), embeddings.float()
+
+def predict_weather(model, image, profile=None, return_stage=False, return_embedding=False):
+    """Predict weather category from image.
+
+    With `profile=True` (or WEATHER_PROFILE=1 when `profile` is None) the
+    forward pass runs under torch.profiler; see `profiling.get_last_profile()`.
+
+    `model` may be a `cascade.CascadeModel`; with `return_stage=True` a third
+    value names the stage that answered (None for a single model).
+    With `return_embedding=True` the last value is the pooled feature vector
+    (see `forward_with_embedding`), or None for models without one.
+    """
+    from cascade import CascadeModel
+
+    if profile is None:
+        profile = profiling.profiling_enabled()
+    stage = None
+    embedding = None
+    with torch.inference_mode(), STAGE_SECONDS.time(stage='forward'):
+        if profile:
+            outputs, _ = profiling.profile_forward(model, image)
+        elif isinstance(model, CascadeModel):
+            outputs, stages = model.predict(image)
+            stage = stages[0]
+        elif return_embedding and has_embeddings(model):
+            outputs, embeddings = forward_with_embedding(model, image)
+            embedding = embeddings[0].numpy()
+        else:
+            outputs = model(image)
         _, predicted = torch.max(outputs, 1)
         probabilities = torch.nn.functional.softmax(outputs, dim=1)[0] * 100
-    return predicted.item(), probabilities.numpy()
+    result = (predicted.item(), probabilities.numpy())
+    if return_stage:
+        result += (stage,)
+    if return_embedding:
+        result += (embedding,)
+    return result
 
-def text_to_speech(text, language='en'):
-    """Convert text to speech with language support."""
-    def speak():
-        try:
-            engine = pyttsx3.init()
-            
-            # Get available voices
-            voices = engine.getProperty('voices')
-            
-            # Set voice based on language
-            if language == 'ar':
-                # Try to find Arabic voice
-                arabic_voice = None
-                for voice in voices:
-                    if 'arabic' in voice.name.lower() or 'ar-' in voice.id.lower():
-                        arabic_voice = voice.id
-                        break
-                
-                if arabic_voice:
-                    engine.setProperty('voice', arabic_voice)
+def preprocess_images(images, batch_size=16):
+    """Preprocess an iterable of images into stacked batches of at most `batch_size`."""
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    batch = []
+    for image in images:
+        batch.append(PREPROCESSOR.load(image))
+        if len(batch) == batch_size:
+            yield PREPROCESSOR.stack(batch)
+            batch = []
+    if batch:
+        yield PREPROCESSOR.stack(batch)
+
+def prediction_key(model, image):
+    """The cache key `predict_weather_cached` uses for a PIL image (also the embedding store key)."""
+    return image_cache_key(PREPROCESSOR.load(image), get_model_version(model))
+
+def predict_weather_cached(model, image, cache, return_stage=False, embeddings=None, source=None):
+    """Predict weather for a PIL image, reusing `cache` to skip repeat forward passes.
+
+    The cache key hashes the decoded, model-sized image, so the full-resolution
+    pixels are never hashed. With `return_stage=True` a cache hit reports 'cache'.
+    With an `EmbeddingStore` as `embeddings`, a forward pass also stores the
+    image's embedding under the same key, labelled with `source`.
+    """
+    loaded = PREPROCESSOR.load(image)
+    key = image_cache_key(loaded, get_model_version(model))
+    cached = cache.get(key)
+    if cached is not None:
+        return (*cached, 'cache') if return_stage else cached
+    if embeddings is None:
+        pred, probs, stage = predict_weather(model, PREPROCESSOR.stack([loaded]), return_stage=True)
+    else:
+        pred, probs, stage, embedding = predict_weather(model, PREPROCESSOR.stack([loaded]), return_stage=True,
+                                                        return_embedding=True)
+        if embedding is not None:
+            _store_embeddings(embeddings, embedding[None], [key], [WEATHER_CLASSES[pred]], [probs[pred]], [source])
+    cache.put(key, pred, probs)
+    return (pred, probs, stage) if return_stage else (pred, probs)
+
+def _store_embeddings(embeddings, *args):
+    """EmbeddingStore.add that only logs failures: storing an embedding must never fail a prediction."""
+    try:
+        embeddings.add(*args)
+    except Exception as e:
+        print(f"⚠️ Could not store embeddings: {e}")
+
+def predict_weather_batch(model, images, batch_size=16, cache=None, embeddings=None, sources=None):
+    """Predict weather categories for many images in batched forward passes.
+
+    Returns an array of N class indices and an N x len(WEATHER_CLASSES)
+    matrix of probabilities (in percent, like `predict_weather`). With a
+    `PredictionCache`, hits are answered directly and only misses are batched.
+    With an `EmbeddingStore`, the embeddings of the batched images are stored,
+    labelled with `sources` (one name per image).
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+
+    version = get_model_version(model)
+    predictions = []
+    probabilities = []
+    pending = []  # (index, cache key, loaded image) of images that need a forward pass
+
+    store_embeddings = embeddings is not None and has_embeddings(model)
+
+    def flush():
+        with torch.inference_mode():
+            batch = PREPROCESSOR.stack(loaded for _, _, loaded in pending)
+            with STAGE_SECONDS.time(stage='forward'):
+                if store_embeddings:
+                    outputs, batch_embeddings = forward_with_embedding(model, batch)
                 else:
-                    # Fallback to slower speech rate for Arabic text
-                    engine.setProperty('rate', 150)
-            else:
-                # Use English voice (usually default)
-                english_voice = None
-                for voice in voices:
-                    if 'english' in voice.name.lower() or 'en-' in voice.id.lower():
-                        english_voice = voice.id
-                        break
-                
-                if english_voice:
-                    engine.setProperty('voice', english_voice)
-                
-                engine.setProperty('rate', 180)
-            
-            # Set volume
-            engine.setProperty('volume', 0.9)
-            
-            # Speak the text
-            engine.say(text)
-            engine.runAndWait()
-            engine.stop()
-            
-        except Exception as e:
-            print(f"TTS Error: {e}")
-    
-    # Run TTS in a separate thread to avoid blocking the UI
-    thread = threading.Thread(target=speak)
-    thread.daemon = True
-    thread.start()
-
-def get_voice_announcement(class_name, language='English', confidence=None):
-    """Get voice announcement text for the predicted weather."""
-    
-    # Voice announcements in both languages
-    voice_texts = {
-        "English": {
-            'Cloudy': f"The weather prediction is Cloudy with {confidence:.1f}% confidence. Overcast skies with possible light rain.",
-            'Rain': f"The weather prediction is Rain with {confidence:.1f}% confidence. Rain is expected, grab an umbrella!",
-            'Shine': f"The weather prediction is Shine with {confidence:.1f}% confidence. Clear skies, great for outdoor activities!",
-            'Sunrise': f"The weather prediction is Sunrise with {confidence:.1f}% confidence. Beautiful sunrise or sunset conditions.",
-        },
-        "العربية": {
-            'Cloudy': f"التنبؤ بالطقس هو غائم بثقة {confidence:.1f}%. سماء ملبدة بالغيوم مع احتمال هطول أمطار خفيفة.",
-            'Rain': f"التنبؤ بالطقس هو ممطر بثقة {confidence:.1f}%. من المتوقع هطول أمطار، لا تنس المظلة!",
-            'Shine': f"التنبؤ بالطقس هو مشمس بثقة {confidence:.1f}%. سماء صافية، طقس مناسب للنشاطات الخارجية!",
-            'Sunrise': f"التنبؤ بالطقس هو شروق بثقة {confidence:.1f}%. شروق أو غروب جميل.",
-        }
-    }
-    
-    if confidence is None:
-        # Simplified version without confidence
-        voice_texts["English"][class_name] = voice_texts["English"][class_name].split(" with")[0] + "."
-        voice_texts["العربية"][class_name] = voice_texts["العربية"][class_name].split(" بثقة")[0] + "."
-    
-    return voice_texts.get(language, voice_texts["English"]).get(class_name, "Weather prediction complete.")
+                    outputs = model(batch)
+            batch_preds = outputs.argmax(dim=1).numpy()
+            batch_probs = (torch.nn.functional.softmax(outputs, dim=1) * 100).numpy()
+        for (index, key, _), pred, probs in zip(pending, batch_preds, batch_probs):
+            predictions[index] = pred
+            probabilities[index] = probs
+            if cache is not None:
+                cache.put(key, pred, probs)
+        if store_embeddings:
+            _store_embeddings(
+                embeddings,
+                batch_embeddings.numpy(),
+                [key for _, key, _ in pending],
+                [WEATHER_CLASSES[pred] for pred in batch_preds],
+                [probs[pred] for pred, probs in zip(batch_preds, batch_probs)],
+                [sources[index] if sources is not None else None for index, _, _ in pending],
+            )
+        pending.clear()
+
+    for index, image in enumerate(images):
+        predictions.append(None)
+        probabilities.append(None)
+        loaded = PREPROCESSOR.load(image)
+        key = None
+        if cache is not None or store_embeddings:
+            key = image_cache_key(loaded, version)
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                predictions[index], probabilities[index] = cached
+                continue
+        pending.append((index, key, loaded))
+        if len(pending) == batch_size:
+            flush()
+    if pending:
+        flush()
+
+    if not predictions:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(WEATHER_CLASSES)), dtype=np.float32)
+    return np.asarray(predictions, dtype=np.int64), np.stack(probabilities).astype(np.float32)
+
+def text_to_speech(text, language='en'):
+    """Queue text for the background speech worker (see speech.py); returns immediately."""
+    get_tts_worker().speak(text, language)
@@ -0,0 +1,111 @@
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from metrics import CACHE_LOOKUPS
+
+
+def image_cache_key(image, model_version):
+    """Content-address an image: hash of its decoded pixels plus the model version."""
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(str(model_version).encode())
+    digest.update(f"|{image.mode}|{image.size[0]}x{image.size[1]}|".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """Bounded in-memory LRU of predictions with an optional sqlite tier on disk.
+
+    Values are `(class_index, probabilities)` tuples exactly as returned by
+    `predict_weather`. A hit skips preprocessing and the forward pass.
+    """
+
+    def __init__(self, max_entries=512, disk_path=None):
+        self.max_entries = max_entries
+        self.disk_path = disk_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                "key TEXT PRIMARY KEY, class_index INTEGER, probabilities BLOB)"
+            )
+            self._db.commit()
+
+    def get(self, key):
+        """Return the cached prediction for `key`, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_LOOKUPS.inc(result='hit')
+                return self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT class_index, probabilities FROM predictions WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value = (row[0], np.frombuffer(row[1], dtype=np.float32).copy())
+                    self._remember(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    CACHE_LOOKUPS.inc(result='disk_hit')
+                    return value
+
+            self.misses += 1
+            CACHE_LOOKUPS.inc(result='miss')
+            return None
+
+    def put(self, key, prediction, probabilities):
+        """Store a prediction in memory and, if enabled, on disk."""
+        value = (int(prediction), np.asarray(probabilities, dtype=np.float32))
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+                    (key, value[0], value[1].tobytes()),
+                )
+                self._db.commit()
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        """Hit/miss counters and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+            }
+
+    def clear(self):
+        """Drop every cached prediction (memory and disk)."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,241 @@
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+from model_utils import WEATHER_CLASSES
+
+# Shared by the app, classify_images.py and inference_server.py
+HISTORY_DIR = os.environ.get('WEATHER_HISTORY_DIR', 'history')
+CHANNELS = ('ui', 'cli', 'service')
+# Compacted parts are merged into one file once there are more than this many
+MAX_PARTS = 32
+
+
+class HistoryWriter:
+    """Records predictions from a background thread so callers never wait on disk.
+
+    `record` only appends to an in-memory queue (bounded by `max_pending`;
+    beyond that records are dropped and counted). The writer thread appends
+    them as JSON lines to a segment file of its own and starts a new
+    segment after `rotate_bytes`. Every `compact_interval` seconds it closes
+    the segment and runs `compact`, which moves closed segments into
+    columnar parquet files for queries.
+    """
+
+    def __init__(self, directory=HISTORY_DIR, flush_interval=1.0, rotate_bytes=16 * 2**20,
+                 compact_interval=60.0, max_pending=10000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.rotate_bytes = rotate_bytes
+        self.compact_interval = compact_interval
+        self.max_pending = max_pending
+        self.written = 0
+        self.dropped = 0
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._segment = None
+        self._segment_path = None
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, class_name, probabilities, channel='ui', source=None, model_version=None,
+               stage=None, latency_ms=None):
+        """Queue one prediction; `probabilities` are in percent, in WEATHER_CLASSES order."""
+        row = {
+            'ts': time.time(),
+            'channel': channel,
+            'source': source,
+            'class': class_name,
+            'confidence': float(max(probabilities)),
+            **{f"prob_{c}": float(p) for c, p in zip(WEATHER_CLASSES, probabilities)},
+            'stage': stage,
+            'model_version': None if model_version is None else str(model_version),
+            'latency_ms': latency_ms,
+        }
+        with self._condition:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(row)
+            self._condition.notify()
+
+    def stats(self):
+        with self._condition:
+            return {'pending': len(self._pending), 'written': self.written, 'dropped': self.dropped}
+
+    def _write(self, rows):
+        if self._segment is None:
+            # ".open" until rotated, so compaction never reads a segment that is still growing
+            self._segment_path = os.path.join(self.directory, f"log-{os.getpid()}-{time.time_ns()}.jsonl.open")
+            self._segment = open(self._segment_path, 'a')
+        self._segment.write(''.join(json.dumps(row) + '\n' for row in rows))
+        self._segment.flush()
+        self.written += len(rows)
+        if self._segment.tell() >= self.rotate_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        if self._segment is not None:
+            self._segment.close()
+            os.replace(self._segment_path, self._segment_path[:-len('.open')])
+            self._segment = None
+
+    def _run(self):
+        last_compaction = time.monotonic()
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._closed or len(self._pending) >= 256, self.flush_interval)
+                rows = list(self._pending)
+                self._pending.clear()
+                closed = self._closed
+            try:
+                if rows:
+                    self._write(rows)
+                if closed or time.monotonic() - last_compaction >= self.compact_interval:
+                    last_compaction = time.monotonic()
+                    self._rotate()
+                    if not closed:
+                        compact(self.directory)
+            except Exception as e:
+                print(f"⚠️ Prediction history: {e}")
+            if closed:
+                return
+
+    def close(self):
+        """Write everything still queued and close the current segment."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout=10)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _closed_segments(directory):
+    """Rotated segments, plus open segments left behind by processes that died."""
+    segments = glob.glob(os.path.join(directory, 'log-*.jsonl'))
+    for path in glob.glob(os.path.join(directory, 'log-*.jsonl.open')):
+        if not _pid_alive(int(os.path.basename(path).split('-')[1])):
+            segments.append(path)
+    return sorted(segments)
+
+
+def _schema(pa):
+    return pa.schema(
+        [('ts', pa.timestamp('ms', tz='UTC')), ('channel', pa.string()), ('source', pa.string()),
+         ('class', pa.string()), ('confidence', pa.float32())]
+        + [(f"prob_{c}", pa.float32()) for c in WEATHER_CLASSES]
+        + [('stage', pa.string()), ('model_version', pa.string()), ('latency_ms', pa.float32())]
+    )
+
+
+def _parts(directory):
+    return sorted(glob.glob(os.path.join(directory, 'compacted', 'part-*.parquet')))
+
+
+@contextmanager
+def _compaction_lock(directory, exclusive):
+    """Exclusive for compactions, shared for readers, so a merge never deletes parts mid-read."""
+    with open(os.path.join(directory, '.compact.lock'), 'a') as lock:
+        try:
+            import fcntl
+            fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        except ImportError:
+            pass
+        yield
+
+
+def compact(directory=HISTORY_DIR):
+    """Move closed JSONL segments into a parquet part; returns the number of rows compacted.
+
+    Safe to run from several processes: a lock file serializes compactions.
+    Once there are more than MAX_PARTS parts they are merged into one.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.join(directory, 'compacted'), exist_ok=True)
+    with _compaction_lock(directory, exclusive=True):
+        segments = _closed_segments(directory)
+        rows = []
+        for path in segments:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        rows.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn last line from a process that died mid-write
+                        continue
+        if rows:
+            schema = _schema(pa)
+            columns = {name: [row.get(name) for row in rows] for name in schema.names}
+            columns['ts'] = [int(ts * 1000) for ts in columns['ts']]
+            _write_part(pq, pa.Table.from_pydict(columns, schema=schema), directory)
+        for path in segments:
+            os.remove(path)
+
+        parts = _parts(directory)
+        if len(parts) > MAX_PARTS:
+            _write_part(pq, pq.read_table(parts, schema=_schema(pa)), directory)
+            for path in parts:
+                os.remove(path)
+    return len(rows)
+
+
+def _write_part(pq, table, directory):
+    path = os.path.join(directory, 'compacted', f"part-{time.time_ns()}.parquet")
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+
+def load_history(directory=HISTORY_DIR, columns=None, since=None):
+    """Compacted predictions as a pyarrow Table, optionally only those at or after `since` (epoch seconds)."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    if not _parts(directory):
+        return _schema(pa).empty_table().select(columns or _schema(pa).names)
+    needed = None if columns is None else sorted(set(columns) | ({'ts'} if since is not None else set()))
+    with _compaction_lock(directory, exclusive=False):
+        table = pq.read_table(_parts(directory), columns=needed, schema=_schema(pa))
+    if since is not None:
+        table = table.filter(pc.greater_equal(table['ts'], pa.scalar(int(since * 1000), pa.timestamp('ms', tz='UTC'))))
+    return table.select(columns) if columns else table
+
+
+def class_counts_per_hour(directory=HISTORY_DIR, since=None):
+    """Table of (hour, class, count): the class distribution of predictions per hour."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    table = load_history(directory, ['ts', 'class'], since)
+    hours = pa.table({'hour': pc.floor_temporal(table['ts'], unit='hour'), 'class': table['class']})
+    counts = hours.group_by(['hour', 'class']).aggregate([('class', 'count')])
+    return counts.rename_columns(['hour', 'class', 'count']).sort_by([('hour', 'ascending'), ('class', 'ascending')])
+
+
+def confidence_histogram(directory=HISTORY_DIR, bins=10, since=None):
+    """(counts, bin edges) of top-class confidence over 0-100%."""
+    confidence = load_history(directory, ['confidence'], since)['confidence'].to_numpy(zero_copy_only=False)
+    return np.histogram(confidence, bins=bins, range=(0, 100))
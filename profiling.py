@@ -0,0 +1,110 @@
+import os
+import time
+from contextlib import contextmanager
+
+import torch
+from torch.profiler import ProfilerActivity, profile, record_function
+
+# Set WEATHER_PROFILE=1 to profile every forward pass made by predict_weather
+PROFILE_ENV_VAR = "WEATHER_PROFILE"
+PROFILE_DIR_ENV_VAR = "WEATHER_PROFILE_DIR"
+
+_last_report = None
+
+
+def profiling_enabled():
+    """Whether the WEATHER_PROFILE environment variable turns profiling on."""
+    return os.environ.get(PROFILE_ENV_VAR, "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def get_last_profile():
+    """Report dict from the most recent profiled forward pass, or None."""
+    return _last_report
+
+
+def _profiled_modules(model):
+    """The EfficientNet `features` blocks plus the custom classifier head."""
+    modules = []
+    features = getattr(model, "features", None)
+    if features is not None:
+        modules.extend((f"features.{i}", block) for i, block in enumerate(features))
+    classifier = getattr(model, "classifier", None)
+    if classifier is not None and len(classifier) > 1:
+        modules.append(("classifier.1", classifier[1]))
+    return modules
+
+
+@contextmanager
+def _module_scopes(model):
+    """Label each profiled module's forward pass with a record_function scope."""
+    handles = []
+    for name, module in _profiled_modules(model):
+        scopes = []
+
+        def enter(mod, args, name=name, scopes=scopes):
+            scope = record_function(name)
+            scope.__enter__()
+            scopes.append(scope)
+
+        def leave(mod, args, output, scopes=scopes):
+            scopes.pop().__exit__(None, None, None)
+
+        handles.append(module.register_forward_pre_hook(enter))
+        handles.append(module.register_forward_hook(leave))
+    try:
+        yield
+    finally:
+        for handle in handles:
+            handle.remove()
+
+
+def _module_table(prof, module_names):
+    """Per-module CPU time and memory, sorted by total CPU time."""
+    rows = [event for event in prof.key_averages() if event.key in module_names]
+    rows.sort(key=lambda event: event.cpu_time_total, reverse=True)
+    lines = [f"{'Module':<16}{'CPU total (ms)':>16}{'CPU self (ms)':>16}{'CPU mem (MB)':>14}"]
+    for event in rows:
+        lines.append(
+            f"{event.key:<16}"
+            f"{event.cpu_time_total / 1000:>16.2f}"
+            f"{event.self_cpu_time_total / 1000:>16.2f}"
+            f"{event.cpu_memory_usage / 2**20:>14.1f}"
+        )
+    return "\n".join(lines)
+
+
+def profile_forward(model, image, output_dir=None, top_n=20):
+    """Run one forward pass under torch.profiler and export the results.
+
+    Writes a Chrome trace (open in chrome://tracing or Perfetto) and a
+    flamegraph stacks file to `output_dir`, and returns the model outputs
+    together with a report dict holding the per-module and top-N op tables.
+    """
+    global _last_report
+    output_dir = output_dir or os.environ.get(PROFILE_DIR_ENV_VAR, "profiles")
+    os.makedirs(output_dir, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+
+    with profile(
+        activities=[ProfilerActivity.CPU],
+        record_shapes=True,
+        profile_memory=True,
+        with_stack=True,
+    ) as prof:
+        with _module_scopes(model), torch.no_grad():
+            outputs = model(image)
+
+    trace_path = os.path.join(output_dir, f"forward-{stamp}.trace.json")
+    stacks_path = os.path.join(output_dir, f"forward-{stamp}.stacks")
+    prof.export_chrome_trace(trace_path)
+    # Render with: flamegraph.pl --title "B7 forward" forward-*.stacks > flame.svg
+    prof.export_stacks(stacks_path, "self_cpu_time_total")
+
+    module_names = {name for name, _ in _profiled_modules(model)}
+    _last_report = {
+        "trace_path": trace_path,
+        "stacks_path": stacks_path,
+        "module_table": _module_table(prof, module_names),
+        "op_table": prof.key_averages().table(sort_by="self_cpu_time_total", row_limit=top_n),
+    }
+    return outputs, _last_report
@@ -0,0 +1,104 @@
+import copy
+import io
+import statistics
+import time
+
+import torch
+import torch.nn as nn
+from torch.ao.quantization import get_default_qconfig_mapping, quantize_dynamic
+from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+PRECISIONS = ('fp32', 'int8-dynamic', 'int8')
+
+
+def _quantized_engine():
+    """Pick the best quantized kernel backend available on this CPU."""
+    supported = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in supported:
+            torch.backends.quantized.engine = engine
+            return engine
+    raise RuntimeError("❌ No quantized engine available in this PyTorch build")
+
+
+def quantize_head_dynamic(model):
+    """Dynamically quantize the Linear layers (the classifier head) to int8."""
+    return quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_trunk_static(model, calibration_batches):
+    """FX-graph static int8 quantization of the conv trunk (`model.features`).
+
+    `calibration_batches` is an iterable of preprocessed N x 3 x 224 x 224
+    tensors used to observe activation ranges before conversion.
+    """
+    engine = _quantized_engine()
+    qconfig_mapping = get_default_qconfig_mapping(engine)
+    example_inputs = (torch.randn(1, 3, 224, 224),)
+
+    prepared = prepare_fx(model.features, qconfig_mapping, example_inputs)
+    seen = 0
+    with torch.no_grad():
+        for batch in calibration_batches:
+            prepared(batch)
+            seen += batch.shape[0]
+    if seen == 0:
+        raise ValueError("❌ Calibration needs at least one image")
+
+    model.features = convert_fx(prepared)
+    print(f"📏 Calibrated int8 trunk on {seen} images ({engine} engine)")
+    return model
+
+
+def quantize_model(model, precision, calibration_batches=None):
+    """Return an int8 copy of a float `model`; the original is left untouched."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"❌ Unknown precision '{precision}', expected one of {PRECISIONS}")
+    if precision == 'fp32':
+        return model
+
+    quantized = copy.deepcopy(model)
+    if precision == 'int8':
+        if calibration_batches is None:
+            raise ValueError("❌ Static int8 quantization needs calibration images")
+        quantized = quantize_trunk_static(quantized, calibration_batches)
+    quantized = quantize_head_dynamic(quantized)
+    quantized.eval()
+    return quantized
+
+
+def model_size_mb(model):
+    """Serialized size of the model's state dict in megabytes."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.getbuffer().nbytes / 2**20
+
+
+def measure_latency_ms(model, batch_size=1, runs=10, warmup=2):
+    """Median forward-pass latency on a random batch, in milliseconds."""
+    inputs = torch.randn(batch_size, 3, 224, 224)
+    timings = []
+    with torch.no_grad():
+        for i in range(warmup + runs):
+            start = time.perf_counter()
+            model(inputs)
+            if i >= warmup:
+                timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def compare_precisions(baseline, quantized, precision, runs=10):
+    """Size and latency of `quantized` next to the fp32 `baseline`, printed and returned."""
+    report = {
+        'precision': precision,
+        'fp32_size_mb': model_size_mb(baseline),
+        'size_mb': model_size_mb(quantized),
+        'fp32_latency_ms': measure_latency_ms(baseline, runs=runs),
+        'latency_ms': measure_latency_ms(quantized, runs=runs),
+    }
+    print(
+        f"📊 {precision}: {report['size_mb']:.1f} MB vs fp32 {report['fp32_size_mb']:.1f} MB, "
+        f"{report['latency_ms']:.1f} ms vs fp32 {report['fp32_latency_ms']:.1f} ms "
+        f"({report['fp32_latency_ms'] / report['latency_ms']:.2f}x speedup)"
+    )
+    return report
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import torch
+
+# Runtime backends predict_weather can run on. Exported artifacts are
+# created by export_model.py; TorchScript and ONNX Runtime don't need torchvision.
+BACKENDS = ('eager', 'torchscript', 'onnxruntime')
+
+EXPORT_DIR = os.environ.get('WEATHER_EXPORT_DIR', 'exported')
+TORCHSCRIPT_FILENAME = 'weather_model.ts'
+ONNX_FILENAME = 'weather_model.onnx'
+
+
+def exported_path(backend, export_dir=None):
+    """Default location of the exported artifact for `backend`."""
+    filename = {'torchscript': TORCHSCRIPT_FILENAME, 'onnxruntime': ONNX_FILENAME}[backend]
+    return os.path.join(export_dir or EXPORT_DIR, filename)
+
+
+class TorchScriptBackend:
+    """Runs a traced TorchScript module (frozen and optimized for inference)."""
+
+    name = 'torchscript'
+
+    def __init__(self, path):
+        module = torch.jit.load(path, map_location='cpu')
+        self.module = torch.jit.optimize_for_inference(torch.jit.freeze(module.eval()))
+        self.path = path
+
+    def __call__(self, images):
+        with torch.inference_mode():
+            return self.module(images)
+
+
+class OnnxRuntimeBackend:
+    """Runs an ONNX export on the ONNX Runtime CPU provider with full graph optimizations."""
+
+    name = 'onnxruntime'
+
+    def __init__(self, path, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise RuntimeError("❌ The onnxruntime backend needs `pip install onnxruntime`") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.path = path
+
+    def __call__(self, images):
+        inputs = np.ascontiguousarray(images.detach().cpu().numpy(), dtype=np.float32)
+        (logits,) = self.session.run(None, {self.input_name: inputs})
+        return torch.from_numpy(logits)
+
+
+def load_backend(backend, path=None, export_dir=None):
+    """Load an exported model for `backend`; the result is called like the eager model."""
+    if backend not in BACKENDS or backend == 'eager':
+        raise ValueError(f"❌ Unknown exported backend '{backend}', expected one of {BACKENDS[1:]}")
+    path = path or exported_path(backend, export_dir)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"❌ No exported model at '{path}'.\n"
+            f"💡 Run `python export_model.py --format {backend}` first."
+        )
+    if backend == 'torchscript':
+        return TorchScriptBackend(path)
+    return OnnxRuntimeBackend(path)
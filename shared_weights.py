@@ -0,0 +1,151 @@
+import json
+import os
+import warnings
+
+import numpy as np
+import torch
+
+# One flat weights file that every app process maps read-only. /dev/shm keeps
+# it in shared memory; any path on a local disk works too (shared page cache).
+SHARED_WEIGHTS_PATH = os.environ.get(
+    'WEATHER_SHARED_WEIGHTS',
+    '/dev/shm/weather_model.weights' if os.path.isdir('/dev/shm') else 'weather_model.weights',
+)
+
+# Version 2 headers also record the checkpoint the file was made from
+_MAGIC = b'WTHRWGT2'
+_ALIGNMENT = 64
+
+_NUMPY_DTYPES = {
+    torch.float32: np.float32,
+    torch.float16: np.float16,
+    torch.float64: np.float64,
+    torch.int64: np.int64,
+    torch.int32: np.int32,
+    torch.uint8: np.uint8,
+    torch.bool: np.bool_,
+}
+
+
+def _align(offset):
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def checkpoint_identity(model_path):
+    """What identifies a checkpoint file without reading it: path, inode, size, mtime and ctime.
+
+    ctime can't be set from user space, so a file replaced in place keeps
+    nothing but its path, even when copied with `cp -p` or restored from a backup.
+    """
+    stat = os.stat(model_path)
+    return {
+        'path': os.path.realpath(model_path),
+        'inode': stat.st_ino,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'ctime_ns': stat.st_ctime_ns,
+    }
+
+
+def write_shared_weights(state_dict, path, source=None):
+    """Write a state dict as one flat, aligned file: magic, header length, JSON header, raw tensors.
+
+    The header holds the tensor index and `source`, the `checkpoint_identity`
+    of the checkpoint the weights came from.
+
+    The file is written to a temporary name and renamed into place, so
+    processes starting at the same time never map a half-written file.
+    """
+    index = {}
+    offset = 0
+    arrays = []
+    for name, tensor in state_dict.items():
+        if tensor.dtype not in _NUMPY_DTYPES:
+            raise ValueError(f"❌ Can't share tensor '{name}' of dtype {tensor.dtype}")
+        array = tensor.detach().cpu().contiguous().numpy()
+        offset = _align(offset)
+        index[name] = {'dtype': str(tensor.dtype).replace('torch.', ''), 'shape': list(array.shape), 'offset': offset}
+        arrays.append((offset, array))
+        offset += array.nbytes
+
+    header = json.dumps({'source': source, 'tensors': index}).encode()
+    data_start = _align(len(_MAGIC) + 8 + len(header))
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for array_offset, array in arrays:
+            f.seek(data_start + array_offset)
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+def _read_header(mapped, path):
+    if bytes(mapped[:len(_MAGIC)]) != _MAGIC:
+        raise ValueError(f"❌ '{path}' is not a shared weights file (or was written by an older version)")
+    header_length = int.from_bytes(bytes(mapped[len(_MAGIC):len(_MAGIC) + 8]), 'little')
+    header_start = len(_MAGIC) + 8
+    header = json.loads(bytes(mapped[header_start:header_start + header_length]))
+    return header, _align(header_start + header_length)
+
+
+def shared_weights_source(path):
+    """The `checkpoint_identity` recorded in a shared weights file, or None if it has none or can't be read."""
+    try:
+        with open(path, 'rb') as f:
+            prefix = f.read(len(_MAGIC) + 8)
+            header_length = int.from_bytes(prefix[len(_MAGIC):], 'little')
+            return _read_header(np.frombuffer(prefix + f.read(header_length), dtype=np.uint8), path)[0]['source']
+    except (OSError, ValueError):
+        return None
+
+
+def load_shared_state_dict(path):
+    """Map a shared weights file read-only and return tensors that view it (no copies)."""
+    mapped = np.memmap(path, dtype=np.uint8, mode='r')
+    header, data_start = _read_header(mapped, path)
+    index = header['tensors']
+
+    state_dict = {}
+    with warnings.catch_warnings():
+        # The mapping is read-only on purpose; torch warns about non-writable arrays
+        warnings.simplefilter('ignore', UserWarning)
+        for name, entry in index.items():
+            dtype = np.dtype(_NUMPY_DTYPES[getattr(torch, entry['dtype'])])
+            count = int(np.prod(entry['shape'], dtype=np.int64))
+            start = data_start + entry['offset']
+            array = mapped[start:start + count * dtype.itemsize].view(dtype).reshape(entry['shape'])
+            state_dict[name] = torch.from_numpy(array)
+    return state_dict
+
+
+def ensure_shared_weights(model_path, shared_path=None):
+    """Create (or refresh) the shared weights file from a checkpoint and return its path.
+
+    The file is rebuilt whenever it wasn't made from this exact checkpoint
+    file (see `checkpoint_identity`), e.g. after another checkpoint was loaded
+    or this one was replaced, even by an older copy.
+    """
+    shared_path = shared_path or SHARED_WEIGHTS_PATH
+    source = checkpoint_identity(model_path)
+    if shared_weights_source(shared_path) != source:
+        print(f"🧩 Writing shared weights to {shared_path}...")
+        state_dict = torch.load(model_path, map_location='cpu', weights_only=True)
+        write_shared_weights(state_dict, shared_path, source=source)
+    return shared_path
+
+
+def process_memory_mb():
+    """Resident memory of this process split into anonymous and file/shmem-backed parts (Linux)."""
+    fields = {'VmRSS': 'rss_mb', 'RssAnon': 'anon_mb', 'RssFile': 'file_mb', 'RssShmem': 'shmem_mb'}
+    usage = {}
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                key, _, value = line.partition(':')
+                if key in fields:
+                    usage[fields[key]] = int(value.split()[0]) / 1024
+    except OSError:
+        pass
+    return usage
@@ -0,0 +1,325 @@
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from metrics import STAGE_SECONDS
+
+# Speaking rate per language (Arabic only when no Arabic voice is installed)
+LANGUAGE_RATES = {'ar': 150, 'en': 180}
+VOICE_KEYWORDS = {'ar': ('arabic', 'ar-'), 'en': ('english', 'en-')}
+LANGUAGE_CODES = {'English': 'en', 'العربية': 'ar'}
+
+# Rendered announcement clips, one file per (class, language, confidence bucket)
+AUDIO_CACHE_DIR = os.environ.get('WEATHER_AUDIO_CACHE_DIR', 'announcement_audio')
+CONFIDENCE_STEP = 5
+
+# Per class: the announcement up to the confidence, and the rest of it
+VOICE_ANNOUNCEMENTS = {
+    "English": {
+        'Cloudy': ("The weather prediction is Cloudy", " with {confidence}% confidence. Overcast skies with possible light rain."),
+        'Rain': ("The weather prediction is Rain", " with {confidence}% confidence. Rain is expected, grab an umbrella!"),
+        'Shine': ("The weather prediction is Shine", " with {confidence}% confidence. Clear skies, great for outdoor activities!"),
+        'Sunrise': ("The weather prediction is Sunrise", " with {confidence}% confidence. Beautiful sunrise or sunset conditions."),
+    },
+    "العربية": {
+        'Cloudy': ("التنبؤ بالطقس هو غائم", " بثقة {confidence}%. سماء ملبدة بالغيوم مع احتمال هطول أمطار خفيفة."),
+        'Rain': ("التنبؤ بالطقس هو ممطر", " بثقة {confidence}%. من المتوقع هطول أمطار، لا تنس المظلة!"),
+        'Shine': ("التنبؤ بالطقس هو مشمس", " بثقة {confidence}%. سماء صافية، طقس مناسب للنشاطات الخارجية!"),
+        'Sunrise': ("التنبؤ بالطقس هو شروق", " بثقة {confidence}%. شروق أو غروب جميل."),
+    },
+}
+
+
+def get_voice_announcement(class_name, language='English', confidence=None):
+    """Get voice announcement text for the predicted weather.
+
+    An int confidence (a bucket) is spoken as is, anything else with one decimal.
+    """
+    announcements = VOICE_ANNOUNCEMENTS.get(language, VOICE_ANNOUNCEMENTS["English"])
+    if class_name not in announcements:
+        return "Weather prediction complete."
+    prefix, rest = announcements[class_name]
+    if confidence is None:
+        # Simplified version without confidence
+        return prefix + "."
+    return prefix + rest.format(confidence=confidence if isinstance(confidence, int) else f"{confidence:.1f}")
+
+
+class TTSWorker:
+    """One long-lived thread that owns a single pyttsx3 engine and speaks queued announcements.
+
+    `speak` never blocks: it appends to a bounded queue. When the queue is
+    full the oldest pending announcement is dropped, a repeat of an
+    announcement already waiting is coalesced into it, and anything that has
+    waited longer than `stale_after` seconds is skipped when dequeued - a
+    prediction that was superseded is not worth saying anymore.
+
+    `render` writes speech to an audio file on the same engine instead
+    (pyttsx3 engines must stay on one thread); live announcements go first.
+    """
+
+    def __init__(self, max_pending=3, stale_after=15.0):
+        self.max_pending = max_pending
+        self.stale_after = stale_after
+        self.spoken = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self._pending = deque()
+        self._renders = deque()
+        self._condition = threading.Condition()
+        self._voices = {}
+        self._engine = None
+        self._thread = threading.Thread(target=self._run, name='tts', daemon=True)
+        self._thread.start()
+
+    def speak(self, text, language='en'):
+        """Queue `text` for speech; returns False if it was coalesced into a pending duplicate."""
+        with self._condition:
+            for entry in self._pending:
+                if entry[0] == text and entry[1] == language:
+                    entry[2] = time.monotonic()
+                    self.coalesced += 1
+                    return False
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append([text, language, time.monotonic()])
+            self._condition.notify()
+        return True
+
+    def render(self, text, language, path, urgent=False):
+        """Queue `text` to be written to the audio file `path`; returns a Future resolving to `path`."""
+        future = Future()
+        with self._condition:
+            job = (text, language, path, future)
+            if urgent:
+                self._renders.appendleft(job)
+            else:
+                self._renders.append(job)
+            self._condition.notify()
+        return future
+
+    def prioritize(self, future):
+        """Move a queued render to the front, e.g. when a user is waiting for it."""
+        with self._condition:
+            for job in self._renders:
+                if job[3] is future:
+                    self._renders.remove(job)
+                    self._renders.appendleft(job)
+                    break
+
+    @property
+    def queue_depth(self):
+        with self._condition:
+            return len(self._pending)
+
+    @property
+    def queue_depths(self):
+        with self._condition:
+            return {'speak': len(self._pending), 'render': len(self._renders)}
+
+    def stats(self):
+        with self._condition:
+            return {
+                'queue_depth': len(self._pending),
+                'spoken': self.spoken,
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'renders_pending': len(self._renders),
+            }
+
+    def _next(self):
+        """The next job as (text, language, path, future); path and future are None to speak."""
+        with self._condition:
+            while True:
+                while not self._pending and not self._renders:
+                    self._condition.wait()
+                if not self._pending:
+                    return self._renders.popleft()
+                text, language, queued_at = self._pending.popleft()
+                if time.monotonic() - queued_at <= self.stale_after:
+                    return text, language, None, None
+                self.dropped += 1
+
+    def _voice(self, language):
+        """Voice id for `language`, looked up once per language (None: engine default)."""
+        if language not in self._voices:
+            keywords = VOICE_KEYWORDS.get(language, VOICE_KEYWORDS['en'])
+            self._voices[language] = next(
+                (voice.id for voice in self._engine.getProperty('voices')
+                 if keywords[0] in voice.name.lower() or keywords[1] in voice.id.lower()),
+                None,
+            )
+        return self._voices[language]
+
+    def _configure(self, language):
+        if self._engine is None:
+            import pyttsx3
+            self._engine = pyttsx3.init()
+            self._engine.setProperty('volume', 0.9)
+            self._default_voice = self._engine.getProperty('voice')
+            self._default_rate = self._engine.getProperty('rate')
+
+        voice = self._voice(language)
+        self._engine.setProperty('voice', voice or self._default_voice)
+        # Properties persist on the shared engine, so every one is set per announcement;
+        # a real Arabic voice keeps the engine's default rate
+        if language == 'ar' and voice:
+            self._engine.setProperty('rate', self._default_rate)
+        else:
+            self._engine.setProperty('rate', LANGUAGE_RATES.get(language, LANGUAGE_RATES['en']))
+
+    def _run(self):
+        while True:
+            text, language, path, future = self._next()
+            if future is not None and not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._configure(language)
+                if path is None:
+                    self._engine.say(text)
+                    self._engine.runAndWait()
+                    self.spoken += 1
+                else:
+                    # Render next to the target and rename, so readers never see a partial clip
+                    partial = f"{path}.partial{os.path.splitext(path)[1]}"
+                    with STAGE_SECONDS.time(stage='tts_render'):
+                        self._engine.save_to_file(text, partial)
+                        self._engine.runAndWait()
+                    os.replace(partial, path)
+                    future.set_result(path)
+            except Exception as e:
+                print(f"TTS Error: {e}")
+                # A broken engine is re-created for the next job
+                self._engine = None
+                self._voices.clear()
+                if future is not None:
+                    future.set_exception(e)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_tts_worker():
+    """The process-wide TTS worker, started on first use."""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = TTSWorker()
+        return _worker
+
+
+def tts_queue_depth():
+    """Jobs waiting for the TTS engine by kind: announcements to speak and clips to render."""
+    if _worker is None:
+        return {'speak': 0, 'render': 0}
+    return _worker.queue_depths
+
+
+def confidence_bucket(confidence, step=CONFIDENCE_STEP):
+    """Round a 0-100 confidence to the nearest multiple of `step`."""
+    return int(round(float(confidence) / step) * step)
+
+
+class AnnouncementAudioCache:
+    """Announcement clips rendered once by the TTS engine and reused from disk.
+
+    A clip is keyed by (class, language, confidence rounded to `step`
+    percent), so playing an announcement is a file read instead of a
+    synthesis. The file name also carries a hash of the spoken text, so
+    editing an announcement renders it again. Clips are WAV files from
+    pyttsx3's save-to-file (the espeak and SAPI5 drivers write WAV).
+    """
+
+    def __init__(self, cache_dir=AUDIO_CACHE_DIR, step=CONFIDENCE_STEP, worker=None):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.step = step
+        self._worker = worker
+        self._rendering = {}  # clip path -> Future
+        self._warming = []
+        self._warm_failed = False
+        self._lock = threading.Lock()
+
+    @property
+    def worker(self):
+        if self._worker is None:
+            self._worker = get_tts_worker()
+        return self._worker
+
+    def clip(self, class_name, language, confidence):
+        """(text, clip path) for an announcement; the clip may not be rendered yet."""
+        bucket = confidence_bucket(confidence, self.step)
+        text = get_voice_announcement(class_name, language, bucket)
+        digest = hashlib.blake2b(text.encode(), digest_size=6).hexdigest()
+        code = LANGUAGE_CODES.get(language, 'en')
+        return text, os.path.join(self.cache_dir, f"{class_name}_{code}_{bucket:03d}_{digest}.wav")
+
+    def _schedule(self, class_name, language, confidence, urgent=False):
+        text, path = self.clip(class_name, language, confidence)
+        if os.path.exists(path):
+            return path, None
+        with self._lock:
+            future = self._rendering.get(path)
+            if future is None:
+                future = self.worker.render(text, LANGUAGE_CODES.get(language, 'en'), path, urgent=urgent)
+                self._rendering[path] = future
+                future.add_done_callback(lambda _, path=path: self._rendering.pop(path, None))
+            elif urgent:
+                self.worker.prioritize(future)
+        return path, future
+
+    def get(self, class_name, language, confidence, timeout=15.0):
+        """Path of the rendered clip, rendering it first if needed; None if that fails."""
+        path, future = self._schedule(class_name, language, confidence, urgent=True)
+        if future is not None:
+            try:
+                future.result(timeout)
+            except Exception as e:
+                print(f"TTS Error: {e}")
+                return None
+        return path
+
+    def warm(self, classes, languages=tuple(LANGUAGE_CODES), min_confidence=25):
+        """Queue every missing clip for background rendering; returns how many were queued.
+
+        The top class of four always has at least 25% confidence, so lower
+        buckets are never announced. Cheap to call again: clips already
+        rendered or queued are skipped. After the first failed render (e.g.
+        no TTS engine on the host) the rest of the warm-up is cancelled and
+        later calls queue nothing; `get` still tries the clip it is asked for.
+        """
+        if self._warm_failed:
+            return 0
+        queued = 0
+        for language in languages:
+            for class_name in classes:
+                for bucket in range(confidence_bucket(min_confidence, self.step), 101, self.step):
+                    future = self._schedule(class_name, language, bucket)[1]
+                    if future is not None and future not in self._warming:
+                        self._warming.append(future)
+                        future.add_done_callback(self._warm_done)
+                        queued += 1
+        return queued
+
+    def _warm_done(self, future):
+        if future.cancelled() or future.exception() is None:
+            with self._lock:
+                if future in self._warming:
+                    self._warming.remove(future)
+            return
+        with self._lock:
+            self._warm_failed = True
+            warming, self._warming = self._warming, []
+        for pending in warming:
+            pending.cancel()
+
+    def stats(self):
+        with self._lock:
+            rendering = len(self._rendering)
+        clips = sum(name.endswith('.wav') and '.partial' not in name for name in os.listdir(self.cache_dir))
+        return {'clips': clips, 'rendering': rendering}
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Cold-start timing: break app/model start-up time down by phase."""
+
+import time
+from contextlib import contextmanager
+
+_PROCESS_START = time.perf_counter()
+
+
+class PhaseTimer:
+    """Records how long each named start-up phase takes, in order."""
+
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def report(self):
+        """Human-readable table of phase durations."""
+        total = sum(seconds for _, seconds in self.phases)
+        lines = ["⏱️ Startup timing"]
+        for name, seconds in self.phases:
+            share = seconds / total if total else 0.0
+            lines.append(f"  {name:<24}{seconds * 1000:>10.1f} ms  {share:>6.1%}")
+        lines.append(f"  {'total':<24}{total * 1000:>10.1f} ms")
+        lines.append(f"  {'since process start':<24}{(time.perf_counter() - _PROCESS_START) * 1000:>10.1f} ms")
+        return "\n".join(lines)
+
+
+# Shared timer that load_model and the app record into
+STARTUP = PhaseTimer()
+
+
+def main():
+    """Measure a cold start in this (fresh) process and print the report."""
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--weights', default='best_model.pth')
+    args = parser.parse_args()
+
+    # Record into the same timer instance model_utils imports (not this __main__ copy)
+    from startup_timing import STARTUP as timer
+
+    with timer.phase('import torch'):
+        import torch
+    with timer.phase('import model_utils'):
+        from model_utils import load_model
+    model = load_model(args.weights)
+    with timer.phase('first forward'), torch.inference_mode():
+        model(torch.zeros(1, 3, 224, 224))
+    print(timer.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Tests for the HTTP inference service against aiohttp's local test client.
+
+    python -m pytest test_inference_server.py
+"""
+
+import asyncio
+import io
+import unittest
+
+import numpy as np
+import torch
+from aiohttp.test_utils import TestClient, TestServer
+from PIL import Image
+
+from inference_server import create_app
+from model_utils import WEATHER_CLASSES
+
+
+class TinyModel(torch.nn.Module):
+    """A few-parameter stand-in for the B7, so the tests need no weights."""
+
+    model_version = 'tiny-test-model'
+
+    def __init__(self):
+        super().__init__()
+        self.pool = torch.nn.AdaptiveAvgPool2d(1)
+        self.head = torch.nn.Linear(3, len(WEATHER_CLASSES))
+
+    def forward(self, images):
+        return self.head(self.pool(images).flatten(1))
+
+
+def jpeg_bytes(seed):
+    image = Image.fromarray(np.random.RandomState(seed).randint(0, 255, (120, 160, 3), dtype=np.uint8))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+class InferenceServerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        torch.manual_seed(0)
+        self.app = create_app(model=TinyModel().eval(), max_batch_size=4, max_wait_ms=200, cache_entries=0)
+        self.client = TestClient(TestServer(self.app))
+        await self.client.start_server()
+        await self.wait_until_ready()
+
+    async def asyncTearDown(self):
+        await self.client.close()
+
+    async def wait_until_ready(self, timeout=30.0):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            response = await self.client.get('/readyz')
+            if response.status == 200:
+                return await response.json()
+            await asyncio.sleep(0.05)
+        self.fail("service never became ready")
+
+    async def test_readyz(self):
+        body = await self.wait_until_ready()
+        self.assertEqual(body['status'], 'ready')
+        self.assertEqual(body['model_version'], 'tiny-test-model')
+
+    async def test_concurrent_predictions_are_batched(self):
+        responses = await asyncio.gather(*(self.client.post('/predict', data=jpeg_bytes(seed)) for seed in range(4)))
+        bodies = [await response.json() for response in responses]
+        self.assertEqual([response.status for response in responses], [200] * 4)
+        for body in bodies:
+            self.assertIn(body['class'], WEATHER_CLASSES)
+            self.assertAlmostEqual(sum(body['probabilities'].values()), 100.0, places=3)
+        # With a 200 ms window, four simultaneous requests share forward passes
+        self.assertGreater(max(body['batch_size'] for body in bodies), 1)
+
+    async def test_rejects_non_image_upload(self):
+        response = await self.client.post('/predict', data=b'definitely not an image')
+        self.assertEqual(response.status, 400)
+        self.assertIn('cannot decode image', await response.text())
+
+    async def test_reports_failed_model_load(self):
+        def broken_loader():
+            raise FileNotFoundError("no weights")
+
+        client = TestClient(TestServer(create_app(model_loader=broken_loader)))
+        await client.start_server()
+        try:
+            for _ in range(100):
+                response = await client.get('/readyz')
+                body = await response.json()
+                if body['status'] != 'loading':
+                    break
+                await asyncio.sleep(0.05)
+            self.assertEqual(response.status, 503)
+            self.assertEqual(body['status'], 'failed')
+            self.assertIn('no weights', body['error'])
+        finally:
+            await client.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
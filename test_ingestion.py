@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Tests for upload validation and zip expansion, with small in-memory images and archives.
+
+    python -m pytest test_ingestion.py
+"""
+
+import io
+import struct
+import unittest
+import zipfile
+import zlib
+
+import numpy as np
+from PIL import Image
+
+from ingestion import ImageRejected, expand_uploads, ingest, open_image
+from model_utils import PREPROCESSOR
+
+
+class Upload(io.BytesIO):
+    """Stands in for a Streamlit upload: `.name` and `.getvalue()`."""
+
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+def image_bytes(image_format='JPEG', size=(64, 48), seed=0):
+    pixels = np.random.RandomState(seed).randint(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def png_header(width, height):
+    """An RGB PNG declaring `width` x `height` pixels in its IHDR chunk, with no pixel data at all."""
+    def chunk(kind, body):
+        return struct.pack('>I', len(body)) + kind + body + struct.pack('>I', zlib.crc32(kind + body))
+
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', ihdr) + chunk(b'IEND', b'')
+
+
+def zip_bytes(members, compression=zipfile.ZIP_DEFLATED):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', compression) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def corrupt_member(data, name):
+    """Overwrite the middle of `name`'s compressed data, so its deflate stream or CRC no longer checks out."""
+    data = bytearray(data)
+    info = zipfile.ZipFile(io.BytesIO(bytes(data))).getinfo(name)
+    name_length, extra_length = struct.unpack('<HH', data[info.header_offset + 26:info.header_offset + 30])
+    start = info.header_offset + 30 + name_length + extra_length
+    middle = start + info.compress_size // 2
+    data[middle:middle + 16] = bytes(16)
+    return bytes(data)
+
+
+def mark_encrypted(data, name):
+    """Set the "encrypted" flag of `name` in its local header and central directory entry."""
+    data = bytearray(data)
+    info = zipfile.ZipFile(io.BytesIO(bytes(data))).getinfo(name)
+    data[info.header_offset + 6] |= 0x1
+    central = data.rfind(b'PK\x01\x02' + bytes(data[info.header_offset + 4:info.header_offset + 6]))
+    while data[central + 46:central + 46 + len(name)] != name.encode():
+        central = data.rfind(b'PK\x01\x02', 0, central)
+    data[central + 8] |= 0x1
+    return bytes(data)
+
+
+def read_all(items):
+    """{name: bytes or the ImageRejected message} for expand_uploads items."""
+    results = {}
+    for name, read in items:
+        try:
+            results[name] = read()
+        except ImageRejected as e:
+            results[name] = str(e)
+    return results
+
+
+class OpenImageTest(unittest.TestCase):
+    def test_accepts_jpeg_and_png(self):
+        self.assertEqual(open_image(image_bytes('JPEG')).format, 'JPEG')
+        self.assertEqual(open_image(image_bytes('PNG')).size, (64, 48))
+
+    def test_byte_limit(self):
+        data = image_bytes()
+        open_image(data, max_bytes=len(data))
+        with self.assertRaisesRegex(ImageRejected, 'the limit is'):
+            open_image(data, max_bytes=len(data) - 1)
+        with self.assertRaisesRegex(ImageRejected, 'empty file'):
+            open_image(b'')
+
+    def test_signature(self):
+        for data in (image_bytes('GIF'), b'%PDF-1.7 not an image', b'RIFF' + image_bytes()):
+            with self.assertRaisesRegex(ImageRejected, 'not a JPEG/PNG image'):
+                open_image(data)
+
+    def test_pixel_limit_is_read_from_the_header(self):
+        with self.assertRaisesRegex(ImageRejected, 'the limit is 0 MP'):
+            open_image(image_bytes(size=(64, 48)), max_pixels=64 * 48 - 1)
+        # 45 bytes declaring 10 gigapixels: rejected from the header alone
+        with self.assertRaisesRegex(ImageRejected, 'too many pixels'):
+            open_image(png_header(100_000, 100_000))
+        with self.assertRaisesRegex(ImageRejected, '8000x6000'):
+            open_image(png_header(8000, 6000), max_pixels=40_000_000)
+
+    def test_ingest_decodes_model_image_and_preview(self):
+        data = image_bytes(size=(1024, 768))
+        ingested = ingest(data, PREPROCESSOR, preview_size=128)
+        self.assertEqual(ingested.original_size, (1024, 768))
+        self.assertEqual(ingested.num_bytes, len(data))
+        self.assertLessEqual(max(ingested.preview.size), 128)
+        self.assertEqual(min(ingested.image.size), 256)
+        with self.assertRaisesRegex(ImageRejected, 'cannot decode image'):
+            ingest(data[:len(data) // 2], PREPROCESSOR)
+
+
+class ExpandUploadsTest(unittest.TestCase):
+    def test_lists_zip_members_and_plain_images(self):
+        first, second = image_bytes(seed=1), image_bytes('PNG', seed=2)
+        archive = zip_bytes({'b.png': second, 'dir/a.jpg': first, 'notes.txt': b'not an image', 'dir/': b''})
+
+        items = expand_uploads([Upload('sky.jpg', first), Upload('skies.zip', archive)])
+        self.assertEqual([name for name, _ in items], ['sky.jpg', 'skies.zip/b.png', 'skies.zip/dir/a.jpg'])
+        self.assertEqual([read() for _, read in items], [first, second, first])
+
+    def test_oversized_member_is_rejected_before_decompressing(self):
+        small, large = image_bytes(size=(16, 16)), image_bytes(size=(256, 256))
+        archive = zip_bytes({'large.jpg': large, 'small.jpg': small})
+
+        results = read_all(expand_uploads([Upload('skies.zip', archive)], max_bytes=len(small)))
+        self.assertIn('the limit is', results['skies.zip/large.jpg'])
+        self.assertEqual(results['skies.zip/small.jpg'], small)
+
+    def test_bad_or_empty_zip(self):
+        results = read_all(expand_uploads([Upload('broken.zip', b'PK\x03\x04 truncated'), Upload('empty.zip', zip_bytes({}))]))
+        self.assertEqual(results, {'broken.zip': 'not a valid zip archive'})
+
+    def test_image_count_limit(self):
+        archive = zip_bytes({f"{i}.jpg": image_bytes(size=(8, 8), seed=i) for i in range(3)})
+        self.assertEqual(len(expand_uploads([Upload('skies.zip', archive)], max_images=3)), 3)
+        with self.assertRaisesRegex(ImageRejected, 'more than 3 images'):
+            expand_uploads([Upload('skies.zip', archive), Upload('sky.jpg', image_bytes())], max_images=3)
+
+    def test_corrupt_and_encrypted_members_are_rejected_individually(self):
+        good = image_bytes(seed=1)
+        archive = zip_bytes({'a_good.jpg': good, 'b_corrupt.jpg': image_bytes(seed=2), 'c_locked.jpg': image_bytes(seed=3)})
+        archive = mark_encrypted(corrupt_member(archive, 'b_corrupt.jpg'), 'c_locked.jpg')
+
+        results = read_all(expand_uploads([Upload('skies.zip', archive)]))
+        self.assertEqual(results['skies.zip/a_good.jpg'], good)
+        self.assertIn('cannot read archive member', results['skies.zip/b_corrupt.jpg'])
+        self.assertIn('encrypted', results['skies.zip/c_locked.jpg'])
+
+    def test_oversized_uploads_are_rejected_before_reading(self):
+        image, archive = image_bytes(), zip_bytes({'sky.jpg': image_bytes()})
+        uploads = [Upload('big.jpg', image + bytes(1)), Upload('big.zip', archive), Upload('ok.jpg', image)]
+        uploads[0].getvalue = uploads[1].getvalue = lambda: self.fail("oversized upload was read")
+
+        results = read_all(expand_uploads(uploads, max_bytes=len(image), max_zip_bytes=len(archive) - 1))
+        self.assertIn('the limit is', results['big.jpg'])
+        self.assertIn('the limit is', results['big.zip'])
+        self.assertEqual(results['ok.jpg'], image)
+
+
+if __name__ == '__main__':
+    unittest.main()
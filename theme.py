@@ -0,0 +1,287 @@
+# 🎨 Theme colors and the app stylesheet, formatted once per variant instead of on every rerun
+THEMES = {
+    False: {
+        'bg': "#ffffff",
+        'text': "#000000",
+        'header': "#0D47A1",
+        'subheader': "#555",
+        'box': "#E3F2FD",
+        'card_bg': "#F8F9FA",
+        'border': "#E0E0E0",
+    },
+    True: {
+        'bg': "#121212",
+        'text': "#e0e0e0",
+        'header': "#90CAF9",
+        'subheader': "#B0BEC5",
+        'box': "#1E1E1E",
+        'card_bg': "#2D2D2D",
+        'border': "#404040",
+    },
+}
+
+# 💅 Enhanced Custom CSS with Modern Design Standards
+CSS_TEMPLATE = """
+<style>
+/* Root variables for consistent theming */
+:root {{
+    --primary-color: #667eea;
+    --secondary-color: #764ba2;
+    --success-color: #4CAF50;
+    --warning-color: #FF9800;
+    --error-color: #f44336;
+    --text-primary: {text};
+    --bg-primary: {bg};
+    --bg-secondary: {card_bg};
+    --border-color: {border};
+}}
+
+/* Main app styling with smooth transitions */
+.stApp {{
+    background: linear-gradient(135deg, {bg} 0%, {card_bg} 100%);
+    color: {text};
+    transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1);
+}}
+
+/* Modern button styling */
+.stButton > button {{
+    background: linear-gradient(135deg, var(--primary-color), var(--secondary-color));
+    color: white !important;
+    border: none !important;
+    border-radius: 25px !important;
+    font-size: 16px !important;
+    font-weight: 600 !important;
+    padding: 12px 24px !important;
+    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
+    box-shadow: 0 4px 20px rgba(102, 126, 234, 0.3) !important;
+    position: relative !important;
+    overflow: hidden !important;
+}}
+
+.stButton > button:hover {{
+    transform: translateY(-3px) !important;
+    box-shadow: 0 8px 30px rgba(102, 126, 234, 0.4) !important;
+    background: linear-gradient(135deg, #7c4dff, #536dfe) !important;
+}}
+
+.stButton > button:active {{
+    transform: translateY(-1px) !important;
+    transition: all 0.1s !important;
+}}
+
+.stButton > button:focus {{
+    box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.3) !important;
+    outline: none !important;
+}}
+
+/* Header with gradient text */
+.header {{
+    font-size: 48px !important;
+    font-weight: 800 !important;
+    margin-bottom: 20px !important;
+    text-align: center !important;
+    background: linear-gradient(135deg, {header}, #42A5F5, #7c4dff) !important;
+    -webkit-background-clip: text !important;
+    -webkit-text-fill-color: transparent !important;
+    background-clip: text !important;
+    animation: float 3s ease-in-out infinite !important;
+}}
+
+@keyframes float {{
+    0%, 100% {{ transform: translateY(0px); }}
+    50% {{ transform: translateY(-10px); }}
+}}
+
+.subheader {{
+    font-size: 20px !important;
+    color: {subheader} !important;
+    margin-bottom: 35px !important;
+    text-align: center !important;
+    font-weight: 400 !important;
+    opacity: 0.9 !important;
+}}
+
+/* Enhanced result box with glassmorphism */
+.result-box {{
+    background: rgba(255, 255, 255, 0.1) !important;
+    backdrop-filter: blur(20px) !important;
+    border: 1px solid rgba(255, 255, 255, 0.2) !important;
+    border-radius: 20px !important;
+    padding: 30px !important;
+    margin-top: 30px !important;
+    box-shadow: 0 20px 60px rgba(0, 0, 0, 0.1) !important;
+    transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1) !important;
+}}
+
+.result-box:hover {{
+    transform: translateY(-5px) !important;
+    box-shadow: 0 30px 80px rgba(0, 0, 0, 0.15) !important;
+}}
+
+/* Modern confidence bars with animations */
+.confidence-bar {{
+    height: 24px !important;
+    border-radius: 12px !important;
+    margin-bottom: 16px !important;
+    text-align: center !important;
+    padding: 4px 16px !important;
+    font-weight: 600 !important;
+    font-size: 13px !important;
+    color: white !important;
+    background: linear-gradient(135deg, var(--primary-color), var(--secondary-color)) !important;
+    box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3) !important;
+    transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1) !important;
+    position: relative !important;
+    overflow: hidden !important;
+}}
+
+.confidence-bar::before {{
+    content: '';
+    position: absolute;
+    top: 0;
+    left: -100%;
+    width: 100%;
+    height: 100%;
+    background: linear-gradient(90deg, transparent, rgba(255,255,255,0.3), transparent);
+    transition: left 0.5s ease;
+}}
+
+.confidence-bar:hover {{
+    transform: scale(1.02) !important;
+    box-shadow: 0 6px 25px rgba(102, 126, 234, 0.4) !important;
+}}
+
+.confidence-bar:hover::before {{
+    left: 100%;
+}}
+
+/* Enhanced radio buttons */
+.stRadio > div {{
+    flex-direction: row !important;
+    justify-content: center !important;
+    gap: 15px !important;
+}}
+
+.stRadio > div > label {{
+    background: {card_bg} !important;
+    border: 2px solid {border} !important;
+    border-radius: 15px !important;
+    padding: 12px 20px !important;
+    margin: 0 !important;
+    cursor: pointer !important;
+    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
+    font-weight: 500 !important;
+}}
+
+.stRadio > div > label:hover {{
+    transform: translateY(-2px) !important;
+    box-shadow: 0 8px 25px rgba(0, 0, 0, 0.1) !important;
+    border-color: var(--primary-color) !important;
+}}
+
+/* Sidebar enhancements */
+.css-1d391kg {{
+    background: {card_bg} !important;
+    border-right: 2px solid {border} !important;
+    backdrop-filter: blur(10px) !important;
+}}
+
+/* Enhanced status messages */
+.stSuccess {{
+    background: linear-gradient(135deg, var(--success-color), #45A049) !important;
+    border: none !important;
+    border-radius: 12px !important;
+    color: white !important;
+    font-weight: 500 !important;
+    box-shadow: 0 4px 15px rgba(76, 175, 80, 0.3) !important;
+}}
+
+.stInfo {{
+    background: linear-gradient(135deg, var(--primary-color), #1976D2) !important;
+    border: none !important;
+    border-radius: 12px !important;
+    color: white !important;
+    font-weight: 500 !important;
+    box-shadow: 0 4px 15px rgba(33, 150, 243, 0.3) !important;
+}}
+
+.stError {{
+    background: linear-gradient(135deg, var(--error-color), #d32f2f) !important;
+    border: none !important;
+    border-radius: 12px !important;
+    color: white !important;
+    font-weight: 500 !important;
+    box-shadow: 0 4px 15px rgba(244, 67, 54, 0.3) !important;
+}}
+
+/* File uploader enhancements */
+.stFileUploader {{
+    border: 3px dashed {border} !important;
+    border-radius: 20px !important;
+    background: {card_bg} !important;
+    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
+    padding: 20px !important;
+}}
+
+.stFileUploader:hover {{
+    border-color: var(--primary-color) !important;
+    background: {card_bg} !important;
+    transform: scale(1.02) !important;
+}}
+
+/* Camera input styling */
+.stCameraInput {{
+    border-radius: 20px !important;
+    overflow: hidden !important;
+    box-shadow: 0 8px 30px rgba(0, 0, 0, 0.1) !important;
+    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
+}}
+
+.stCameraInput:hover {{
+    transform: scale(1.02) !important;
+    box-shadow: 0 12px 40px rgba(0, 0, 0, 0.15) !important;
+}}
+
+/* Selectbox enhancements */
+.stSelectbox > div > div {{
+    background: {card_bg} !important;
+    border: 2px solid {border} !important;
+    border-radius: 15px !important;
+    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1) !important;
+}}
+
+.stSelectbox > div > div:hover {{
+    border-color: var(--primary-color) !important;
+    box-shadow: 0 4px 15px rgba(102, 126, 234, 0.2) !important;
+}}
+
+/* Loading spinner enhancement */
+.stSpinner {{
+    border-top-color: var(--primary-color) !important;
+}}
+
+/* Responsive design improvements */
+@media (max-width: 768px) {{
+    .header {{
+        font-size: 36px !important;
+    }}
+    
+    .subheader {{
+        font-size: 16px !important;
+    }}
+    
+    .result-box {{
+        padding: 20px !important;
+        margin-top: 20px !important;
+    }}
+}}
+</style>
+"""
+
+# Keyed by dark_mode
+STYLESHEETS = {dark_mode: CSS_TEMPLATE.format(**colors) for dark_mode, colors in THEMES.items()}
+
+
+def stylesheet(dark_mode):
+    """The ready-to-inject <style> block for light (False) or dark (True) mode."""
+    return STYLESHEETS[bool(dark_mode)]
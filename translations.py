@@ -0,0 +1,125 @@
+# 🗣️ UI strings for every supported language, keyed by the language selector value
+T = {
+    "English": {
+        "title": "⛅ Weather Classifier",
+        "subtitle": "Upload or capture a sky image to predict the weather condition.",
+        "method_label": "Input method:",
+        "upload": "📁 Upload",
+        "camera": "📷 Camera",
+        "upload_prompt": "Upload your sky image:",
+        "camera_prompt": "Take a picture:",
+        "image_rejected": "Image rejected",
+        "predict_button": "🔮 Predict Weather",
+        "model_warming_up": "Model warming up… Predict turns on as soon as it's ready.",
+        "analyzing": "Analyzing the sky...",
+        "batch_count": "🗂️ {n} images ready",
+        "no_images": "No JPG or PNG images found in this upload",
+        "upload_limits": "Up to {image_mb} MB per image and {zip_mb} MB per zip, at most {images} images per upload",
+        "predict_all_button": "🔮 Predict All",
+        "download_csv": "⬇️ Download CSV",
+        "similar_skies": "Similar skies",
+        "similarity": "similarity",
+        "near_duplicate": "Near-duplicate of an earlier image",
+        "history_title": "📜 Prediction History",
+        "history_total": "Predictions recorded",
+        "history_per_hour": "Classes per hour",
+        "history_confidence": "Confidence distribution",
+        "history_empty": "No predictions recorded yet.",
+        "prediction": "🌤️ Prediction",
+        "confidence": "Confidence Levels:",
+        "voice_announcement": "🔊 Voice announcement enabled",
+        "voice_playing": "🎵 Playing voice announcement...",
+        "answered_by": "Answered by",
+        "escalation_rate": "escalation rate",
+        "stages": {"first_stage": "fast model", "second_stage": "EfficientNet-B7", "cache": "cache"},
+        "tips": {
+            'Cloudy': "☁️ Overcast skies. Possible light rain.",
+            'Rain': "🌧️ Rain expected. Grab an umbrella!",
+            'Shine': "☀️ Clear skies. Great for outdoor activities!",
+            'Sunrise': "🌅 Beautiful sunrise or sunset conditions.",
+        },
+        "about_title": "🛠️ About This App",
+        "about_desc": """
+This app uses a deep learning model to classify sky images into 4 weather types:
+
+- ☁️ Cloudy  
+- 🌧️ Rain  
+- ☀️ Shine  
+- 🌅 Sunrise  
+
+**How to use:**
+1. Upload or take a photo of the sky  
+2. Click **Predict Weather**  
+3. View results with confidence levels
+
+*Model: EfficientNet-B7 (97.78% accuracy)*
+""",
+        "details_title": "📊 Model Details",
+        "details": """
+- Input size: 224x224  
+- Framework: PyTorch  
+- Fine-tuned on weather dataset  
+"""
+    },
+    "العربية": {
+        "title": "⛅ مصنف الطقس",
+        "subtitle": "قم بتحميل أو التقاط صورة للسماء للتنبؤ بحالة الطقس.",
+        "method_label": "طريقة الإدخال:",
+        "upload": "📁 تحميل",
+        "camera": "📷 كاميرا",
+        "upload_prompt": "قم بتحميل صورة السماء:",
+        "camera_prompt": "التقط صورة:",
+        "image_rejected": "تم رفض الصورة",
+        "predict_button": "🔮 تنبؤ بالطقس",
+        "model_warming_up": "جارٍ تجهيز النموذج… سيتم تفعيل زر التنبؤ فور جاهزيته.",
+        "analyzing": "جارٍ تحليل السماء...",
+        "batch_count": "🗂️ {n} صور جاهزة",
+        "no_images": "لم يتم العثور على صور JPG أو PNG في هذا الملف",
+        "upload_limits": "حتى {image_mb} ميغابايت لكل صورة و{zip_mb} ميغابايت لكل أرشيف zip، وبحد أقصى {images} صورة في كل رفع",
+        "predict_all_button": "🔮 تنبؤ للكل",
+        "download_csv": "⬇️ تنزيل CSV",
+        "similar_skies": "سماء مشابهة",
+        "similarity": "التشابه",
+        "near_duplicate": "صورة شبه مطابقة لصورة سابقة",
+        "history_title": "📜 سجل التنبؤات",
+        "history_total": "التنبؤات المسجلة",
+        "history_per_hour": "الفئات لكل ساعة",
+        "history_confidence": "توزيع الثقة",
+        "history_empty": "لا توجد تنبؤات مسجلة بعد.",
+        "prediction": "🌤️ التنبؤ",
+        "confidence": "مستويات الثقة:",
+        "voice_announcement": "🔊 الإعلان الصوتي مفعل",
+        "voice_playing": "🎵 جارٍ تشغيل الإعلان الصوتي...",
+        "answered_by": "تمت الإجابة بواسطة",
+        "escalation_rate": "معدل التصعيد",
+        "stages": {"first_stage": "النموذج السريع", "second_stage": "EfficientNet-B7", "cache": "الذاكرة المؤقتة"},
+        "tips": {
+            'Cloudy': "☁️ سماء ملبدة بالغيوم. احتمال هطول أمطار خفيفة.",
+            'Rain': "🌧️ من المتوقع هطول أمطار. لا تنس المظلة!",
+            'Shine': "☀️ سماء صافية. طقس مناسب للنشاطات الخارجية!",
+            'Sunrise': "🌅 شروق أو غروب جميل.",
+        },
+        "about_title": "🛠️ حول هذا التطبيق",
+        "about_desc": """
+يستخدم هذا التطبيق نموذج تعلم عميق لتصنيف صور السماء إلى 4 أنواع من الطقس:
+
+- ☁️ غائم  
+- 🌧️ ممطر  
+- ☀️ مشمس  
+- 🌅 شروق / غروب  
+
+**طريقة الاستخدام:**
+1. قم بتحميل أو التقاط صورة للسماء  
+2. اضغط على **تنبؤ بالطقس**  
+3. عرض النتائج مع مستويات الثقة
+
+*النموذج: EfficientNet-B7 (دقة 97.78%)*
+""",
+        "details_title": "📊 تفاصيل النموذج",
+        "details": """
+- حجم الإدخال: 224x224  
+- الإطار: PyTorch  
+- مدرب على مجموعة بيانات الطقس  
+"""
+    }
+}
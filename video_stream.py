@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""Classify a video file or live camera stream into a smoothed weather label timeline.
+
+Frames are sampled at `--sample-fps`. A sampled frame is classified only if
+its perceptual hash (dHash) or mean brightness differs enough from the last
+classified frame, so inference load follows scene changes rather than the
+frame rate. Frames that need the model are batched, and probabilities are
+smoothed with an exponential moving average. Needs OpenCV (`pip install opencv-python-headless`).
+
+    python video_stream.py rooftop.mp4 --sample-fps 1 --output timeline.jsonl
+    python video_stream.py rtsp://camera.local/stream --sample-fps 0.2
+    python video_stream.py 0            # local camera device 0
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+import torch
+from PIL import Image
+
+from model_utils import ARCHITECTURES, PREPROCESSOR, WEATHER_CLASSES, load_model
+
+
+def frame_signature(image, hash_size=8, margin=2):
+    """(64-bit difference hash, mean luminance) of a PIL image, from one tiny grayscale resize.
+
+    dHash captures structure and is robust to noise and compression;
+    gradients smaller than `margin` grey levels count as flat, so sensor noise
+    in smooth regions (most of a sky) doesn't flip bits. It ignores global
+    brightness, which matters for weather, hence the separate luminance.
+    """
+    small = np.asarray(image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (small[:, 1:] - small[:, :-1] > margin).flatten()
+    return int(np.packbits(bits).view('>u8')[0]), float(small.mean())
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def read_frames(source, sample_fps=1.0):
+    """Yield (frame_index, timestamp_s, PIL RGB image) for frames sampled at `sample_fps`."""
+    try:
+        import cv2
+    except ImportError as e:
+        raise RuntimeError("❌ Video streams need `pip install opencv-python-headless`") from e
+
+    capture = cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not capture.isOpened():
+        raise RuntimeError(f"❌ Cannot open video source '{source}'")
+    native_fps = capture.get(cv2.CAP_PROP_FPS)
+    live = not native_fps or native_fps <= 0 or native_fps > 1000
+    step = 1 if live else max(1, round(native_fps / sample_fps))
+    start = time.monotonic()
+    next_sample = 0.0
+    index = 0
+    try:
+        while True:
+            # grab() skips a frame without decoding it; only sampled frames are retrieved
+            if not capture.grab():
+                break
+            if live:
+                timestamp = time.monotonic() - start
+                sample = timestamp >= next_sample
+            else:
+                timestamp = index / native_fps
+                sample = index % step == 0
+            if sample:
+                ok, frame = capture.retrieve()
+                if ok:
+                    next_sample = timestamp + 1.0 / sample_fps
+                    yield index, timestamp, Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            index += 1
+    finally:
+        capture.release()
+
+
+def classify_stream(model, frames, batch_size=8, hash_threshold=6, luma_threshold=8.0, ema_alpha=0.3,
+                    max_delay=2.0):
+    """Turn sampled frames into timeline rows with raw and EMA-smoothed predictions.
+
+    A frame within `hash_threshold` dHash bits and `luma_threshold` grey
+    levels of the last classified frame reuses its probabilities instead of
+    running the model. Frames needing the model
+    are batched; a partial batch is flushed once its oldest frame has waited
+    `max_delay` seconds, so live streams stay responsive. Unchanged frames
+    are emitted at once when no earlier frame is waiting for the model, so a
+    static scene keeps the timeline moving.
+    """
+    pending = []  # [frame_index, timestamp, loaded image or None, received_at]
+    to_classify = 0
+    last_signature = None
+    last_probs = None
+    smoothed = None
+
+    def flush():
+        nonlocal last_probs, smoothed
+        images = [entry[2] for entry in pending if entry[2] is not None]
+        if images:
+            with torch.inference_mode():
+                outputs = model(PREPROCESSOR.stack(images))
+                batch_probs = iter((torch.nn.functional.softmax(outputs, dim=1) * 100).numpy())
+        rows = []
+        for frame_index, timestamp, image, _ in pending:
+            classified = image is not None
+            if classified:
+                last_probs = next(batch_probs)
+            smoothed = last_probs if smoothed is None else ema_alpha * last_probs + (1 - ema_alpha) * smoothed
+            rows.append({
+                'frame': frame_index,
+                'time_s': round(timestamp, 3),
+                'classified': classified,
+                'class': WEATHER_CLASSES[int(last_probs.argmax())],
+                'smoothed_class': WEATHER_CLASSES[int(smoothed.argmax())],
+                'smoothed_probabilities': {c: round(float(p), 2) for c, p in zip(WEATHER_CLASSES, smoothed)},
+            })
+        pending.clear()
+        return rows
+
+    for frame_index, timestamp, image in frames:
+        signature = frame_signature(image)
+        changed = (
+            last_signature is None
+            or hamming(signature[0], last_signature[0]) > hash_threshold
+            or abs(signature[1] - last_signature[1]) > luma_threshold
+        )
+        if changed:
+            last_signature = signature
+            to_classify += 1
+        pending.append([frame_index, timestamp, PREPROCESSOR.load(image) if changed else None, time.monotonic()])
+
+        if not to_classify or to_classify >= batch_size or time.monotonic() - pending[0][3] >= max_delay:
+            yield from flush()
+            to_classify = 0
+    if pending:
+        yield from flush()
+
+
+def label_segments(rows):
+    """Collapse the smoothed timeline into (start_s, end_s, label) runs."""
+    segments = []
+    for row in rows:
+        if segments and segments[-1]['label'] == row['smoothed_class']:
+            segments[-1]['end_s'] = row['time_s']
+        else:
+            segments.append({'start_s': row['time_s'], 'end_s': row['time_s'], 'label': row['smoothed_class']})
+    return segments
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('source', help="video file, stream URL or camera index")
+    parser.add_argument('--output', help="timeline JSONL file (default: stdout)")
+    parser.add_argument('--weights', default='best_model.pth')
+    parser.add_argument('--arch', default='efficientnet_b7', choices=ARCHITECTURES)
+    parser.add_argument('--sample-fps', type=float, default=1.0, help="frames per second to consider")
+    parser.add_argument('--hash-threshold', type=int, default=6,
+                        help="dHash bits that must change before a frame is re-classified (0-64)")
+    parser.add_argument('--luma-threshold', type=float, default=8.0,
+                        help="mean brightness change (grey levels) that also triggers re-classification")
+    parser.add_argument('--ema-alpha', type=float, default=0.3, help="weight of the newest frame in the EMA")
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-delay', type=float, default=2.0, help="seconds before a partial batch is run")
+    args = parser.parse_args(argv)
+
+    model = load_model(args.weights, arch=args.arch)
+    out = open(args.output, 'w') if args.output else sys.stdout
+    rows = []
+    try:
+        for row in classify_stream(model, read_frames(args.source, args.sample_fps), args.batch_size,
+                                   args.hash_threshold, args.luma_threshold, args.ema_alpha, args.max_delay):
+            rows.append(row)
+            out.write(json.dumps(row) + '\n')
+            out.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.output:
+            out.close()
+
+    classified = sum(row['classified'] for row in rows)
+    print(f"🎞️ {len(rows)} sampled frames, {classified} classified "
+          f"({classified / max(len(rows), 1):.0%}), the rest unchanged scenes", file=sys.stderr)
+    for segment in label_segments(rows):
+        print(f"  {segment['start_s']:>8.1f}s - {segment['end_s']:>8.1f}s  {segment['label']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())